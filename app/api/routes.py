@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, status
 from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 from typing import List
 import os
 import uuid
@@ -12,7 +12,7 @@ from app.models.models import ConversionJob, ConversionFile, JobStatus, FileStat
 from app.api.schemas import (
     JobCreateResponse, 
     JobStatusResponse, 
-    FileStatusResponse,
+    JobProgressResponse,
     ErrorResponse,
     JobNotFoundResponse
 )
@@ -20,10 +20,11 @@ from app.utils.file_utils import (
     ensure_directories,
     extract_zip_file,
     validate_file_size,
-    is_valid_docx_file,
     create_job_directory,
-    safe_filename
+    safe_filename,
+    save_upload_file
 )
+from app.utils.progress import get_job_progress
 from app.workers.tasks import process_conversion_job
 
 logger = logging.getLogger(__name__)
@@ -50,7 +51,7 @@ async def health_check():
         413: {"model": ErrorResponse},
     }
 )
-async def submit_conversion_job(
+def submit_conversion_job(
     file: UploadFile = File(..., description="ZIP file containing DOCX files to convert"),
     db: Session = Depends(get_db)
 ):
@@ -63,6 +64,9 @@ async def submit_conversion_job(
     3. Create a new job in the database
     4. Queue the job for processing
     5. Return a job ID for tracking progress
+    
+    This is a regular (non-async) endpoint so the blocking disk, ZIP and
+    database work runs in the threadpool instead of on the event loop.
     """
     
     # Validate file type
@@ -72,13 +76,6 @@ async def submit_conversion_job(
             detail="Only ZIP files are accepted"
         )
     
-    # Validate file size
-    if file.size and not validate_file_size(file.size):
-        raise HTTPException(
-            status_code=413,
-            detail=f"File too large. Maximum size: {settings.max_file_size} bytes"
-        )
-    
     try:
         # Generate job ID
         job_id = uuid.uuid4()
@@ -90,11 +87,15 @@ async def submit_conversion_job(
         zip_filename = safe_filename(file.filename)
         zip_path = os.path.join(settings.full_upload_path, f"{job_id}_{zip_filename}")
         
-        # Save uploaded file
-        with open(zip_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
+        # Stream uploaded file to disk in chunks, aborting once it exceeds the limit
+        bytes_written = save_upload_file(file.file, zip_path)
+        if not validate_file_size(bytes_written):
+            os.remove(zip_path)
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size: {settings.max_file_size} bytes"
+            )
+
         logger.info(f"Saved uploaded ZIP file to: {zip_path}")
         
         # Extract ZIP file and validate contents
@@ -125,22 +126,24 @@ async def submit_conversion_job(
         db.add(db_job)
         db.flush()  # Get the ID before committing
         
-        # Create file records
-        for filename, file_path in extracted_files:
-            # Validate each DOCX file
-            if not is_valid_docx_file(file_path):
+        # Build file records up front and insert them in a single batch
+        file_rows = []
+        for filename, file_path, file_size, is_valid_docx in extracted_files:
+            # Skip files that failed DOCX validation during extraction
+            if not is_valid_docx:
                 logger.warning(f"Invalid DOCX file: {filename}")
                 continue
-                
-            db_file = ConversionFile(
-                job_id=job_id,
-                filename=filename,
-                original_path=file_path,
-                status=FileStatus.PENDING,
-                file_size=os.path.getsize(file_path)
-            )
-            db.add(db_file)
-        
+
+            file_rows.append({
+                "id": uuid.uuid4(),
+                "job_id": job_id,
+                "filename": filename,
+                "original_path": file_path,
+                "status": FileStatus.PENDING,
+                "file_size": file_size
+            })
+
+        db.bulk_insert_mappings(ConversionFile, file_rows)
         db.commit()
         logger.info(f"Created job {job_id} with {len(extracted_files)} files")
         
@@ -189,28 +192,51 @@ async def get_job_status(
     except ValueError:
         raise HTTPException(status_code=404, detail="Invalid job ID format")
     
-    # Get job from database
-    job = db.query(ConversionJob).filter(ConversionJob.id == job_uuid).first()
+    # Get job and its files from database in a single round-trip
+    job = (
+        db.query(ConversionJob)
+        .options(selectinload(ConversionJob.files))
+        .filter(ConversionJob.id == job_uuid)
+        .first()
+    )
     
     if not job:
         raise HTTPException(status_code=404, detail="Job not found")
     
-    # Get file statuses
-    file_responses = []
-    for file_record in job.files:
-        file_responses.append(FileStatusResponse(
-            filename=file_record.filename,
-            status=file_record.status,
-            error_message=file_record.error_message
-        ))
+    return JobStatusResponse.model_validate(job)
+
+
+@router.get(
+    "/jobs/{job_id}/progress",
+    response_model=JobProgressResponse,
+    responses={
+        404: {"model": JobNotFoundResponse},
+    }
+)
+def get_job_progress_status(job_id: str):
+    """
+    Get live progress of a conversion job.
+    
+    Read directly from Redis without touching the database; lists the
+    files currently being converted and whether the archive is being built.
+    Use the job status endpoint for final per-file results.
+    """
     
-    return JobStatusResponse(
-        job_id=job.id,
-        status=job.status,
-        created_at=job.created_at,
-        download_url=job.download_url,
-        files=file_responses
-    )
+    try:
+        job_uuid = uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Invalid job ID format")
+    
+    try:
+        progress = get_job_progress(str(job_uuid))
+    except Exception as e:
+        logger.error(f"Error reading progress for job {job_id}: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Job progress is temporarily unavailable"
+        )
+    
+    return JobProgressResponse(job_id=job_uuid, progress=progress)
 
 
 @router.get(
@@ -248,7 +274,16 @@ async def download_converted_files(
             detail=f"Job is not completed. Current status: {job.status.value}"
         )
     
-    if not job.output_zip_path or not os.path.exists(job.output_zip_path):
+    # Stat once here and hand the result to FileResponse so it doesn't stat
+    # again before streaming
+    stat_result = None
+    if job.output_zip_path:
+        try:
+            stat_result = os.stat(job.output_zip_path)
+        except FileNotFoundError:
+            pass
+    
+    if stat_result is None:
         raise HTTPException(
             status_code=404,
             detail="Converted files not found"
@@ -260,7 +295,8 @@ async def download_converted_files(
     return FileResponse(
         path=job.output_zip_path,
         media_type="application/zip",
-        filename=filename
+        filename=filename,
+        stat_result=stat_result
     )
 
 
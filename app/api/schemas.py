@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
+from typing import Dict, List, Optional
 from datetime import datetime
 from uuid import UUID
 from app.models.models import JobStatus, FileStatus
@@ -10,27 +10,32 @@ class FileStatusResponse(BaseModel):
     status: FileStatus
     error_message: Optional[str] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class JobCreateResponse(BaseModel):
     job_id: UUID
     file_count: int
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 class JobStatusResponse(BaseModel):
-    job_id: UUID
+    # Populated from ConversionJob.id when validated from the ORM object
+    job_id: UUID = Field(validation_alias=AliasChoices("job_id", "id"))
     status: JobStatus
     created_at: datetime
     download_url: Optional[str] = None
     files: List[FileStatusResponse]
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
+
+
+class JobProgressResponse(BaseModel):
+    job_id: UUID
+    # File ID -> "converting" while a file converts, "archive" -> "creating"
+    # while the final archive is built; empty before and after processing
+    progress: Dict[str, str]
 
 
 class ErrorResponse(BaseModel):
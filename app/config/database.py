@@ -4,19 +4,39 @@ from sqlalchemy.orm import sessionmaker
 from app.config.settings import settings
 
 # Create SQLAlchemy engine
+# The pool is sized to the worker concurrency so connections are reused
+# across tasks instead of reconnecting for each one; the compiled statement
+# cache is enlarged so per-job queries stay cached under varied workloads
 engine = create_engine(
     settings.database_url,
+    query_cache_size=1200,
+    pool_size=settings.celery_concurrency,
+    max_overflow=2 * settings.celery_concurrency,
     pool_pre_ping=True,
-    pool_recycle=3600
+    pool_recycle=1800
 )
 
 # Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Instances stay loaded after commit; code that needs to see changes made
+# elsewhere (e.g. the job record in tasks) refreshes explicitly
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 # Create Base class for models
 Base = declarative_base()
 
 
+def create_schema():
+    """
+    Create missing tables, then any model index missing from a table that
+    already existed: create_all only creates the indexes of the tables it
+    creates itself. The models must be imported first
+    """
+    Base.metadata.create_all(bind=engine)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
 def get_db():
     """Dependency to get database session"""
     db = SessionLocal()
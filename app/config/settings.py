@@ -30,12 +30,22 @@ class Settings(BaseSettings):
     # Worker settings
     celery_broker_url: str = "redis://redis:6379/0"
     celery_result_backend: str = "redis://redis:6379/0"
+    # Worker processes per Celery worker; keep <= CPU cores since each
+    # conversion runs its own LibreOffice process
+    celery_concurrency: int = os.cpu_count() or 1
+    celery_prefetch_multiplier: int = 1
     
     # Security settings
     secret_key: str = "your-secret-key-change-this-in-production"
     
     # LibreOffice settings
     libreoffice_timeout: int = 300  # 5 minutes
+    libreoffice_startup_timeout: int = 30  # Wait for the UNO server to accept connections
+    libreoffice_batch_timeout: int = 1200  # Cap for one multi-file conversion; below the 25 minute soft task limit
+    conversion_batch_size: int = 20  # Files handed to LibreOffice at once
+    # Conversion tasks a job is split into when it has fewer than batch-size
+    # files per batch; roughly the total conversion worker processes
+    conversion_parallelism: int = os.cpu_count() or 1
     
     @property
     def full_upload_path(self) -> str:
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
@@ -8,7 +8,7 @@ import logging
 from contextlib import asynccontextmanager
 
 from app.config.settings import settings
-from app.config.database import engine, Base
+from app.config.database import create_schema
 from app.api.routes import router
 from app.utils.logging_config import setup_logging
 from app.utils.file_utils import ensure_directories
@@ -24,8 +24,8 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     logger.info("Starting up the application")
     
-    # Create database tables
-    Base.metadata.create_all(bind=engine)
+    # Create database tables, and indexes added to existing ones
+    create_schema()
     logger.info("Database tables created")
     
     # Ensure storage directories exist
@@ -58,7 +58,8 @@ app = FastAPI(
     2. Get a job ID and track progress with `/api/v1/jobs/{job_id}`
     3. Download converted PDFs from `/api/v1/jobs/{job_id}/download` when complete
     """,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
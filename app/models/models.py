@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Enum, Integer, Text, ForeignKey, Boolean
+from sqlalchemy import Column, String, DateTime, Enum, Integer, Text, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import UUID
 from app.config.database import Base
@@ -7,14 +7,14 @@ import enum
 from datetime import datetime
 
 
-class JobStatus(enum.Enum):
+class JobStatus(str, enum.Enum):
     PENDING = "PENDING"
     IN_PROGRESS = "IN_PROGRESS" 
     COMPLETED = "COMPLETED"
     FAILED = "FAILED"
 
 
-class FileStatus(enum.Enum):
+class FileStatus(str, enum.Enum):
     PENDING = "PENDING"
     IN_PROGRESS = "IN_PROGRESS"
     COMPLETED = "COMPLETED"
@@ -46,6 +46,10 @@ class ConversionJob(Base):
 
 class ConversionFile(Base):
     __tablename__ = "conversion_files"
+    __table_args__ = (
+        # Serves per-job file lookups, optionally filtered by status
+        Index("ix_conversion_files_job_id_status", "job_id", "status"),
+    )
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
     job_id = Column(UUID(as_uuid=True), ForeignKey("conversion_jobs.id"), nullable=False)
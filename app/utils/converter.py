@@ -1,14 +1,50 @@
 import os
+import atexit
+import shutil
+import signal
+import socket
 import subprocess
 import tempfile
+import threading
+import time
 import logging
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional
 from app.config.settings import settings
 
+try:
+    import uno
+    from com.sun.star.beans import PropertyValue
+    from com.sun.star.lang import DisposedException
+except ImportError:
+    # python3-uno is not installed; fall back to one soffice process per file
+    uno = None
+
 logger = logging.getLogger(__name__)
 
 
+def _uno_properties(**kwargs):
+    """Build a tuple of UNO PropertyValue structs from keyword arguments"""
+    properties = []
+    for name, value in kwargs.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        properties.append(prop)
+    return tuple(properties)
+
+
+def _signal_office(process, sig):
+    """
+    Send a signal to soffice's whole process group; soffice is only a
+    launcher for soffice.bin, which can outlive it
+    """
+    try:
+        os.killpg(process.pid, sig)
+    except ProcessLookupError:
+        pass
+
+
 class DocxToPdfConverter:
     """
     Handles conversion of DOCX files to PDF using LibreOffice
@@ -16,26 +52,225 @@ class DocxToPdfConverter:
     
     def __init__(self):
         self.timeout = settings.libreoffice_timeout
+        self.startup_timeout = settings.libreoffice_startup_timeout
+        self.batch_timeout = settings.libreoffice_batch_timeout
+        
+        # Long-lived headless soffice reused across conversions (UNO only)
+        self._office_process = None
+        self._office_profile = None
+        self._desktop = None
+        self._lock = threading.Lock()
+    
+    def _start_office(self):
+        """
+        Start a headless soffice listening on a local socket and connect to it.
+        Each process gets its own port and user profile so several workers
+        on one host don't collide.
+        """
+        self.shutdown()
+        
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        
+        self._office_profile = tempfile.mkdtemp(prefix='lo_profile_')
+        connection = f"socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext"
+        cmd = [
+            'soffice',
+            '--headless',
+            '--invisible',
+            '--nologo',
+            '--nodefault',
+            '--norestore',
+            '--nofirststartwizard',
+            f"-env:UserInstallation={Path(self._office_profile).as_uri()}",
+            f"--accept={connection}"
+        ]
+        
+        logger.info("Starting LibreOffice server on port %s", port)
+        # In a session of its own, so the launcher and soffice.bin can be
+        # signalled together as one process group
+        self._office_process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+        
+        # Health check: wait until the server accepts a UNO connection
+        local_context = uno.getComponentContext()
+        resolver = local_context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_context
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            try:
+                context = resolver.resolve(f"uno:{connection}")
+                break
+            except Exception:
+                if self._office_process.poll() is not None or time.monotonic() > deadline:
+                    self.shutdown()
+                    raise RuntimeError("LibreOffice server did not accept UNO connections")
+                time.sleep(0.5)
+        
+        self._desktop = context.ServiceManager.createInstanceWithContext(
+            "com.sun.star.frame.Desktop", context
+        )
+        logger.info("Connected to LibreOffice server on port %s", port)
+    
+    def _export_pdf(self, input_path: str, pdf_path: str) -> Optional[str]:
+        """
+        Load a document into the running soffice and store it as PDF.
+        Returns None if LibreOffice cannot load the file.
+        """
+        document = self._desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(os.path.abspath(input_path)),
+            "_blank",
+            0,
+            _uno_properties(Hidden=True)
+        )
+        if document is None:
+            logger.error("LibreOffice could not load %s", input_path)
+            return None
+        
+        try:
+            document.storeToURL(
+                uno.systemPathToFileUrl(os.path.abspath(pdf_path)),
+                _uno_properties(FilterName="writer_pdf_Export")
+            )
+        finally:
+            document.close(True)
+        
+        return pdf_path
     
-    def convert_file(self, input_path: str, output_dir: str) -> Optional[str]:
+    def _convert_with_uno(self, input_path: str, output_dir: str, timeout: float) -> Optional[str]:
+        """
+        Convert a file through the long-lived soffice, restarting it once if
+        the connection was lost. Returns None if LibreOffice cannot load the file.
+        
+        UNO calls have no time limit of their own, so a watchdog kills soffice
+        once a conversion runs past the timeout; that raises
+        subprocess.TimeoutExpired, as the one-off process path would.
+        """
+        pdf_path = os.path.join(output_dir, f"{Path(input_path).stem}.pdf")
+        
+        with self._lock:
+            for attempt in range(2):
+                if self._desktop is None or self._office_process.poll() is not None:
+                    self._start_office()
+                
+                timed_out = threading.Event()
+                process = self._office_process
+                
+                def kill_office():
+                    timed_out.set()
+                    _signal_office(process, signal.SIGKILL)
+                
+                watchdog = threading.Timer(timeout, kill_office)
+                watchdog.daemon = True
+                watchdog.start()
+                try:
+                    result = self._export_pdf(input_path, pdf_path)
+                except Exception as e:
+                    if timed_out.is_set():
+                        # The watchdog killed soffice mid-call
+                        result = None
+                    elif isinstance(e, DisposedException):
+                        logger.warning("Lost connection to LibreOffice server, restarting it")
+                        self.shutdown()
+                        continue
+                    else:
+                        raise
+                finally:
+                    watchdog.cancel()
+                
+                if timed_out.is_set():
+                    self.shutdown()
+                    raise subprocess.TimeoutExpired('soffice', timeout)
+                
+                return result
+        
+        raise RuntimeError("LibreOffice server connection lost")
+    
+    def start(self):
+        """
+        Start the long-lived soffice ahead of the first conversion (UNO only)
+        """
+        if uno is None:
+            return
+        
+        with self._lock:
+            if self._desktop is None or self._office_process.poll() is not None:
+                self._start_office()
+    
+    def shutdown(self):
+        """
+        Stop the long-lived soffice process, if one is running
+        """
+        process, self._office_process = self._office_process, None
+        self._desktop = None
+        
+        if process is not None:
+            # soffice.bin can still be running after the launcher has exited,
+            # so the group is killed either way once the launcher is gone
+            _signal_office(process, signal.SIGTERM)
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+            _signal_office(process, signal.SIGKILL)
+            process.wait()
+        
+        if self._office_profile:
+            shutil.rmtree(self._office_profile, ignore_errors=True)
+            self._office_profile = None
+    
+    def _time_left(self, deadline: Optional[float]) -> float:
+        """Time one LibreOffice call may take: the timeout, capped by a time.monotonic() deadline"""
+        if deadline is None:
+            return self.timeout
+        return max(0, min(self.timeout, deadline - time.monotonic()))
+    
+    def convert_file(self, input_path: str, output_dir: str, deadline: Optional[float] = None) -> Optional[str]:
         """
         Convert a single DOCX file to PDF
         
         Args:
             input_path: Path to the input DOCX file
             output_dir: Directory where PDF should be saved
+            deadline: time.monotonic() value the conversion must finish by,
+                on top of the per-file timeout
             
         Returns:
             Path to the converted PDF file, or None if conversion failed
         """
         
         if not os.path.exists(input_path):
-            logger.error(f"Input file does not exist: {input_path}")
+            logger.error("Input file does not exist: %s", input_path)
             return None
         
         if not os.path.exists(output_dir):
             os.makedirs(output_dir, exist_ok=True)
         
+        # Prefer the persistent LibreOffice server to avoid a cold start per file
+        if uno is not None:
+            try:
+                pdf_path = self._convert_with_uno(input_path, output_dir, self._time_left(deadline))
+                if pdf_path and os.path.exists(pdf_path):
+                    logger.info("Successfully converted %s to %s", input_path, pdf_path)
+                    return pdf_path
+                logger.warning("UNO conversion produced no PDF for %s, retrying with subprocess", input_path)
+            except subprocess.TimeoutExpired:
+                logger.error("Conversion timeout for %s", input_path)
+                return None
+            except Exception as e:
+                logger.warning("UNO conversion failed for %s, retrying with subprocess: %s", input_path, e)
+        
+        timeout = self._time_left(deadline)
+        if timeout <= 0:
+            logger.error("Conversion timeout for %s", input_path)
+            return None
+        
         try:
             # Use LibreOffice headless mode to convert DOCX to PDF
             cmd = [
@@ -48,19 +283,21 @@ class DocxToPdfConverter:
                 input_path
             ]
             
-            logger.info(f"Converting {input_path} to PDF using command: {' '.join(cmd)}")
+            # Only build the command string if it will actually be logged
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("Converting %s to PDF using command: %s", input_path, ' '.join(cmd))
             
             # Run the conversion
             result = subprocess.run(
                 cmd,
-                timeout=self.timeout,
+                timeout=timeout,
                 capture_output=True,
                 text=True,
                 check=False
             )
             
             if result.returncode != 0:
-                logger.error(f"LibreOffice conversion failed: {result.stderr}")
+                logger.error("LibreOffice conversion failed: %s", result.stderr)
                 return None
             
             # Determine output PDF path
@@ -68,19 +305,110 @@ class DocxToPdfConverter:
             pdf_path = os.path.join(output_dir, f"{input_filename}.pdf")
             
             if os.path.exists(pdf_path):
-                logger.info(f"Successfully converted {input_path} to {pdf_path}")
+                logger.info("Successfully converted %s to %s", input_path, pdf_path)
                 return pdf_path
             else:
-                logger.error(f"Expected PDF file not found: {pdf_path}")
+                logger.error("Expected PDF file not found: %s", pdf_path)
                 return None
                 
         except subprocess.TimeoutExpired:
-            logger.error(f"Conversion timeout for {input_path}")
+            logger.error("Conversion timeout for %s", input_path)
             return None
         except Exception as e:
-            logger.error(f"Error converting {input_path}: {str(e)}")
+            logger.error("Error converting %s: %s", input_path, e)
             return None
     
+    def convert_batch(self, input_paths: List[str], output_dir: str,
+                      results: Optional[Dict[str, Optional[str]]] = None) -> Dict[str, Optional[str]]:
+        """
+        Convert several DOCX files to PDF, sharing LibreOffice startup cost
+        
+        With the persistent UNO server each file is converted over the
+        existing connection; otherwise all files are passed to a single
+        libreoffice invocation. Either way the whole batch is bounded by
+        the batch timeout.
+        
+        Args:
+            input_paths: Paths to the input DOCX files
+            output_dir: Directory where PDFs should be saved
+            results: Dict to fill in as files finish, so a caller interrupted
+                mid-batch still has the files converted so far
+            
+        Returns:
+            Mapping of input path to converted PDF path, or None for files
+            that failed to convert, produced an invalid PDF or weren't reached
+            before the batch timeout
+        """
+        if results is None:
+            results = {}
+        
+        if uno is not None:
+            deadline = time.monotonic() + self.batch_timeout
+            for input_path in input_paths:
+                if time.monotonic() >= deadline:
+                    logger.error("Batch conversion timeout in %s, skipping %s", output_dir, input_path)
+                    results[input_path] = None
+                    continue
+                pdf_path = self.convert_file(input_path, output_dir, deadline)
+                results[input_path] = pdf_path if pdf_path and self.validate_conversion(pdf_path) else None
+            return results
+        
+        existing_paths = []
+        for input_path in input_paths:
+            if os.path.exists(input_path):
+                existing_paths.append(input_path)
+            else:
+                logger.error("Input file does not exist: %s", input_path)
+                results[input_path] = None
+        
+        if not existing_paths:
+            return results
+        
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir, exist_ok=True)
+        
+        try:
+            cmd = [
+                'libreoffice',
+                '--headless',
+                '--convert-to',
+                'pdf',
+                '--outdir',
+                output_dir,
+                *existing_paths
+            ]
+            
+            logger.info("Converting %s files to PDF in %s", len(existing_paths), output_dir)
+            
+            result = subprocess.run(
+                cmd,
+                timeout=min(self.timeout * len(existing_paths), self.batch_timeout),
+                capture_output=True,
+                text=True,
+                check=False
+            )
+            
+            # LibreOffice keeps going after a bad file, so check outputs individually
+            if result.returncode != 0:
+                logger.error("LibreOffice batch conversion failed: %s", result.stderr)
+                
+        except subprocess.TimeoutExpired:
+            logger.error("Batch conversion timeout in %s", output_dir)
+        except Exception as e:
+            logger.error("Error converting batch in %s: %s", output_dir, e)
+        
+        for input_path in existing_paths:
+            pdf_path = os.path.join(output_dir, f"{Path(input_path).stem}.pdf")
+            
+            if self.validate_conversion(pdf_path):
+                logger.info("Successfully converted %s to %s", input_path, pdf_path)
+                results[input_path] = pdf_path
+            else:
+                logger.error("Expected PDF file not found or invalid: %s", pdf_path)
+                results[input_path] = None
+        
+        return results
+    
     def is_libreoffice_available(self) -> bool:
         """
         Check if LibreOffice is available on the system
@@ -100,26 +428,34 @@ class DocxToPdfConverter:
         """
         Validate that the converted PDF file is valid
         """
-        if not os.path.exists(pdf_path):
+        # Size check and header read on one descriptor, without a buffered file object
+        try:
+            fd = os.open(pdf_path, os.O_RDONLY)
+        except FileNotFoundError:
             return False
-        
-        # Check if file has content
-        if os.path.getsize(pdf_path) == 0:
+        except Exception as e:
+            logger.error("Error validating PDF %s: %s", pdf_path, e)
             return False
         
-        # Basic PDF validation - check for PDF header
         try:
-            with open(pdf_path, 'rb') as f:
-                header = f.read(4)
-                if header != b'%PDF':
-                    logger.warning(f"Invalid PDF header in {pdf_path}")
-                    return False
+            # Check if file has content
+            if os.fstat(fd).st_size == 0:
+                return False
+            
+            # Basic PDF validation - check for PDF header
+            header = os.pread(fd, 4, 0)
+            if header != b'%PDF':
+                logger.warning("Invalid PDF header in %s", pdf_path)
+                return False
         except Exception as e:
-            logger.error(f"Error validating PDF {pdf_path}: {str(e)}")
+            logger.error("Error validating PDF %s: %s", pdf_path, e)
             return False
+        finally:
+            os.close(fd)
         
         return True
 
 
 # Create a global converter instance
 converter = DocxToPdfConverter()
+atexit.register(converter.shutdown)
@@ -1,18 +1,52 @@
 import os
+import re
 import zipfile
 import shutil
 import mimetypes
-from typing import List, Tuple, Optional
+from typing import BinaryIO, Dict, List, Tuple, Optional
 from pathlib import Path
 from app.config.settings import settings
 import logging
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+try:
+    import libarchive
+except (ImportError, OSError, AttributeError):
+    # libarchive-c is missing or the system libarchive could not be loaded
+    libarchive = None
 
 logger = logging.getLogger(__name__)
 
+# Size of each read when streaming uploads to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Upper bound for the per-entry buffer when extracting with zipfile
+EXTRACT_BUFFER_SIZE = 1024 * 1024
+
+# Block size used when streaming entries out of libarchive
+LIBARCHIVE_BLOCK_SIZE = 1024 * 1024
+
+# Chunk size used when copying PDFs into the output archive
+ARCHIVE_COPY_CHUNK_SIZE = 1024 * 1024
+
+# Characters not allowed in stored filenames
+_SAFE_NAME_RE = re.compile(r'[^\w\-_.]')
 
-def ensure_directories():
-    """Ensure all required directories exist"""
+
+# Set once the storage directories are known to exist in this process
+_directories_ready = False
+
+
+def ensure_directories(force: bool = False):
+    """Ensure all required directories exist (checked once per process unless forced)"""
+    global _directories_ready
+    if _directories_ready and not force:
+        return
+    
     directories = [
         settings.full_upload_path,
         settings.full_output_path,
@@ -21,6 +55,8 @@ def ensure_directories():
     
     for directory in directories:
         os.makedirs(directory, exist_ok=True)
+    
+    _directories_ready = True
 
 
 def validate_file_extension(filename: str) -> bool:
@@ -34,79 +70,314 @@ def validate_file_size(file_size: int) -> bool:
     return file_size <= settings.max_file_size
 
 
-def extract_zip_file(zip_path: str, extract_to: str) -> List[Tuple[str, str]]:
+def save_upload_file(source: BinaryIO, destination: str) -> int:
+    """
+    Copy an uploaded file object to disk in chunks and return the number of bytes read.
+    Stops as soon as the size limit is exceeded, so callers should check the
+    result with validate_file_size
+    """
+    bytes_read = 0
+    with open(destination, 'wb', buffering=UPLOAD_CHUNK_SIZE) as f:
+        while chunk := source.read(UPLOAD_CHUNK_SIZE):
+            bytes_read += len(chunk)
+            if not validate_file_size(bytes_read):
+                break
+            f.write(chunk)
+    return bytes_read
+
+
+def _member_path(extract_to: str, member_name: str) -> str:
+    """
+    Return the path a zip member is extracted to, sanitized the same way
+    as zipfile.ZipFile.extract (no absolute paths or parent references)
+    """
+    arcname = member_name.replace('/', os.path.sep)
+    if os.path.altsep:
+        arcname = arcname.replace(os.path.altsep, os.path.sep)
+    arcname = os.path.splitdrive(arcname)[1]
+    invalid_path_parts = ('', os.path.curdir, os.path.pardir)
+    arcname = os.path.sep.join(x for x in arcname.split(os.path.sep) if x not in invalid_path_parts)
+    return os.path.normpath(os.path.join(extract_to, arcname))
+
+
+def _write_member(blocks, target_path: str, buffer_size: int) -> bool:
+    """
+    Write a member's decompressed blocks to target_path, counting the bytes
+    actually written: the size in the archive header can understate what
+    the entry inflates to. A member that grows past the size limit is
+    removed and False is returned.
+    """
+    written = 0
+    with open(target_path, 'wb', buffering=buffer_size) as dest:
+        for block in blocks:
+            written += len(block)
+            if not validate_file_size(written):
+                break
+            dest.write(block)
+        else:
+            return True
+    
+    os.unlink(target_path)
+    return False
+
+
+def _extract_members_threaded(zip_path: str, members: List[zipfile.ZipInfo], extract_to: str) -> List[Optional[str]]:
+    """
+    Extract members in parallel and return their extracted paths in order,
+    or None for members that inflated past the size limit.
+    zlib releases the GIL while inflating, so threads scale with cores.
+    ZipFile handles are not thread-safe, so each worker opens its own.
+    """
+    # Create parent directories up front so workers don't race on makedirs
+    for parent in {os.path.dirname(_member_path(extract_to, m.filename)) for m in members}:
+        os.makedirs(parent, exist_ok=True)
+
+    local = threading.local()
+    handles = []
+    handles_lock = threading.Lock()
+
+    def extract_member(member: zipfile.ZipInfo) -> Optional[str]:
+        zip_ref = getattr(local, 'zip_ref', None)
+        if zip_ref is None:
+            zip_ref = local.zip_ref = zipfile.ZipFile(zip_path, 'r')
+            with handles_lock:
+                handles.append(zip_ref)
+        
+        # Size the buffer to the entry so small files are written in one call
+        target_path = _member_path(extract_to, member.filename)
+        buffer_size = max(1, min(member.file_size, EXTRACT_BUFFER_SIZE))
+        with zip_ref.open(member) as src:
+            if not _write_member(iter(lambda: src.read(buffer_size), b''), target_path, buffer_size):
+                logger.warning("Skipping %s: file too large once extracted", member.filename)
+                return None
+        return target_path
+
+    max_workers = min(len(members), os.cpu_count() or 1)
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(extract_member, members))
+    finally:
+        for zip_ref in handles:
+            zip_ref.close()
+
+
+def _extract_members_libarchive(zip_path: str, members: List[zipfile.ZipInfo], extract_to: str) -> Dict[str, Optional[str]]:
+    """
+    Extract members in a single pass with libarchive and return a mapping of
+    member name to extracted path, or None for members that inflated past
+    the size limit. libarchive inflates in C without holding the GIL and
+    avoids zipfile's per-read locking and buffering layers.
+    """
+    wanted = {member.filename for member in members}
+    extracted = {}
+    
+    with libarchive.file_reader(zip_path) as archive:
+        for entry in archive:
+            name = entry.pathname
+            if name not in wanted or name in extracted:
+                continue
+            
+            target_path = _member_path(extract_to, name)
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            if _write_member(entry.get_blocks(LIBARCHIVE_BLOCK_SIZE), target_path, LIBARCHIVE_BLOCK_SIZE):
+                extracted[name] = target_path
+            else:
+                logger.warning("Skipping %s: file too large once extracted", name)
+                extracted[name] = None
+    
+    return extracted
+
+
+def extract_zip_file(zip_path: str, extract_to: str) -> List[Tuple[str, str, int, bool]]:
     """
-    Extract zip file and return list of (filename, extracted_path) tuples
-    Only extracts DOCX files
+    Extract zip file and return list of (filename, extracted_path, file_size, is_valid_docx) tuples
+    Only extracts DOCX files; each one is validated in the same pass
     """
     extracted_files = []
     
     try:
         with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            # Get list of files in zip
-            file_list = zip_ref.namelist()
-            
             # Filter for DOCX files
-            docx_files = [f for f in file_list if validate_file_extension(f) and not f.endswith('/')]
-            
-            if len(docx_files) > settings.max_files_per_job:
-                raise ValueError(f"Too many files in zip. Maximum allowed: {settings.max_files_per_job}")
+            docx_members = [
+                f for f in zip_ref.infolist()
+                if validate_file_extension(f.filename) and not f.is_dir()
+            ]
+        
+        if len(docx_members) > settings.max_files_per_job:
+            raise ValueError(f"Too many files in zip. Maximum allowed: {settings.max_files_per_job}")
+        
+        # Check file sizes
+        members = []
+        for file_info in docx_members:
+            if file_info.file_size == 0:
+                logger.warning("Skipping %s: empty file", file_info.filename)
+                continue
+            if file_info.file_size > settings.max_file_size:
+                logger.warning("Skipping %s: file too large (%s bytes)", file_info.filename, file_info.file_size)
+                continue
+            members.append(file_info)
+        
+        if not members:
+            return extracted_files
+        
+        # Prefer libarchive; anything it could not extract (e.g. names it
+        # decodes differently) falls back to the threaded zipfile path
+        extracted_paths = {}
+        if libarchive is not None:
+            try:
+                extracted_paths = _extract_members_libarchive(zip_path, members, extract_to)
+            except libarchive.ArchiveError as e:
+                logger.warning("libarchive extraction failed, falling back to zipfile: %s", e)
+        
+        remaining = [m for m in members if m.filename not in extracted_paths]
+        if remaining:
+            remaining_paths = _extract_members_threaded(zip_path, remaining, extract_to)
+            extracted_paths.update(zip((m.filename for m in remaining), remaining_paths))
+        
+        # Validate each file, taking the size from the zip entry
+        for file_info in members:
+            extracted_path = extracted_paths[file_info.filename]
+            if extracted_path is None:
+                continue
+            extracted_files.append((
+                file_info.filename,
+                extracted_path,
+                file_info.file_size,
+                is_valid_docx_file(extracted_path)
+            ))
             
-            # Extract each DOCX file
-            for file_info in zip_ref.infolist():
-                if file_info.filename in docx_files:
-                    # Check file size
-                    if file_info.file_size > settings.max_file_size:
-                        logger.warning(f"Skipping {file_info.filename}: file too large ({file_info.file_size} bytes)")
-                        continue
-                    
-                    # Extract file
-                    extracted_path = zip_ref.extract(file_info, extract_to)
-                    extracted_files.append((file_info.filename, extracted_path))
-                    
-                    logger.info(f"Extracted {file_info.filename} to {extracted_path}")
+            logger.info("Extracted %s to %s", file_info.filename, extracted_path)
     
     except zipfile.BadZipFile:
         raise ValueError("Invalid zip file")
     except Exception as e:
-        logger.error(f"Error extracting zip file: {str(e)}")
+        logger.error("Error extracting zip file: %s", e)
         raise ValueError(f"Error extracting zip file: {str(e)}")
     
     return extracted_files
 
 
+def _zip_info_from_stat(arcname: str, st: os.stat_result) -> zipfile.ZipInfo:
+    """
+    Build a ZipInfo from an existing stat result, like ZipInfo.from_file
+    with strict_timestamps=False but without another stat call
+    """
+    date_time = time.localtime(st.st_mtime)[0:6]
+    if date_time[0] < 1980:
+        date_time = (1980, 1, 1, 0, 0, 0)
+    elif date_time[0] > 2107:
+        date_time = (2107, 12, 31, 23, 59, 59)
+    
+    zip_info = zipfile.ZipInfo(arcname, date_time)
+    zip_info.external_attr = (st.st_mode & 0xFFFF) << 16
+    zip_info.file_size = st.st_size
+    return zip_info
+
+
+# Rough per-entry size of local header, data descriptor and central
+# directory record, used when preallocating an archive
+ZIP_ENTRY_OVERHEAD = 256
+
+
+def _preallocate(fd: int, length: int):
+    """
+    Reserve disk space for a file before writing it, so the filesystem can
+    lay it out contiguously instead of extending it on every write
+    """
+    if length <= 0 or not hasattr(os, 'posix_fallocate'):
+        return
+    
+    try:
+        os.posix_fallocate(fd, 0, length)
+    except OSError as e:
+        # Not every filesystem supports it; the file then just grows as written
+        logger.debug("Could not preallocate %s bytes: %s", length, e)
+
+
 def create_zip_archive(files: List[Tuple[str, str]], output_path: str) -> str:
     """
     Create zip archive from list of (original_filename, file_path) tuples
+    Missing or empty files are skipped; raises ValueError if none could be added
     Returns path to created zip file
     """
     try:
-        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
+        with ExitStack() as sources_stack:
+            # Open and stat every PDF before writing anything: the fstat sizes
+            # give the preallocation, and the same descriptors are then copied
+            # from, so each file is opened and stat'ed once. A job holds at
+            # most max_files_per_job PDFs, which bounds the descriptors held.
+            # Sources are unbuffered since every read is already a full chunk
+            sources = []
             for original_filename, file_path in files:
-                if os.path.exists(file_path):
-                    # Use original filename in zip, but change extension to .pdf
-                    zip_filename = Path(original_filename).stem + ".pdf"
-                    zip_ref.write(file_path, zip_filename)
-                    logger.info(f"Added {file_path} to zip as {zip_filename}")
-                else:
-                    logger.warning(f"File not found: {file_path}")
+                try:
+                    src = sources_stack.enter_context(open(file_path, 'rb', buffering=0))
+                except FileNotFoundError:
+                    logger.warning("File not found: %s", file_path)
+                    continue
+                
+                st = os.fstat(src.fileno())
+                if st.st_size == 0:
+                    logger.warning("Skipping empty file: %s", file_path)
+                    src.close()
+                    continue
+                
+                sources.append((original_filename, file_path, src, st))
+            
+            estimated_size = sum(st.st_size + ZIP_ENTRY_OVERHEAD for _, _, _, st in sources)
+            
+            fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+            with open(fd, 'wb', buffering=ARCHIVE_COPY_CHUNK_SIZE) as archive_file:
+                _preallocate(fd, estimated_size)
+                
+                # PDFs are already compressed, so store them as-is rather than
+                # spending CPU on a deflate pass that barely shrinks them
+                with zipfile.ZipFile(archive_file, 'w', zipfile.ZIP_STORED, allowZip64=True, strict_timestamps=False) as zip_ref:
+                    for original_filename, file_path, src, st in sources:
+                        with src:
+                            # Use original filename in zip, but change extension to .pdf
+                            zip_filename = Path(original_filename).stem + ".pdf"
+                            zip_info = _zip_info_from_stat(zip_filename, st)
+                            zip_info.compress_type = zip_ref.compression
+                            
+                            # Stream the PDF in fixed-size chunks so memory stays bounded
+                            with zip_ref.open(zip_info, 'w') as dest:
+                                shutil.copyfileobj(src, dest, ARCHIVE_COPY_CHUNK_SIZE)
+                        
+                        logger.info("Added %s to zip as %s", file_path, zip_filename)
+                    
+                    added_count = len(zip_ref.filelist)
+                
+                # Release whatever part of the preallocated space went unused
+                archive_file.truncate(archive_file.tell())
+        
+        if not added_count:
+            os.remove(output_path)
+            raise ValueError("No valid PDF files found")
         
-        logger.info(f"Created zip archive: {output_path}")
+        logger.info("Created zip archive: %s", output_path)
         return output_path
         
     except Exception as e:
-        logger.error(f"Error creating zip archive: {str(e)}")
+        logger.error("Error creating zip archive: %s", e)
         raise ValueError(f"Error creating zip archive: {str(e)}")
 
 
+def _log_cleanup_error(function, path, exc_info):
+    """rmtree error handler that logs an entry it could not remove and carries on"""
+    if not issubclass(exc_info[0], FileNotFoundError):
+        logger.warning("Could not remove %s: %s", path, exc_info[1])
+
+
 def cleanup_directory(directory_path: str):
     """Remove directory and all its contents"""
     try:
         if os.path.exists(directory_path):
-            shutil.rmtree(directory_path)
-            logger.info(f"Cleaned up directory: {directory_path}")
+            # rmtree unlinks relative to open directory fds as it walks; one
+            # entry that can't be removed no longer aborts the rest of the tree
+            shutil.rmtree(directory_path, onerror=_log_cleanup_error)
+            logger.info("Cleaned up directory: %s", directory_path)
     except Exception as e:
-        logger.error(f"Error cleaning up directory {directory_path}: {str(e)}")
+        logger.error("Error cleaning up directory %s: %s", directory_path, e)
 
 
 def get_file_size(file_path: str) -> int:
@@ -143,19 +414,27 @@ def safe_filename(filename: str) -> str:
     Create a safe filename by removing/replacing problematic characters
     """
     # Remove path separators and other problematic characters
-    import re
-    safe_name = re.sub(r'[^\w\-_\.]', '_', filename)
-    return safe_name
+    return _SAFE_NAME_RE.sub('_', filename)
 
 
 def create_job_directory(job_id: str) -> Tuple[str, str]:
     """
     Create directories for a job and return (input_dir, output_dir) paths
     """
-    input_dir = os.path.join(settings.full_temp_path, f"job_{job_id}_input")
-    output_dir = os.path.join(settings.full_temp_path, f"job_{job_id}_output")
+    ensure_directories()
     
-    os.makedirs(input_dir, exist_ok=True)
-    os.makedirs(output_dir, exist_ok=True)
+    temp_dir = Path(settings.full_temp_path)
+    input_dir = temp_dir / f"job_{job_id}_input"
+    output_dir = temp_dir / f"job_{job_id}_output"
+    
+    # The parent already exists, so only the leaf directories need creating
+    try:
+        input_dir.mkdir(exist_ok=True)
+        output_dir.mkdir(exist_ok=True)
+    except FileNotFoundError:
+        # Storage was removed since it was first created; recreate it
+        ensure_directories(force=True)
+        input_dir.mkdir(exist_ok=True)
+        output_dir.mkdir(exist_ok=True)
     
-    return input_dir, output_dir
+    return str(input_dir), str(output_dir)
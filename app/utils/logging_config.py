@@ -1,9 +1,19 @@
+import atexit
 import logging
 import logging.config
+import logging.handlers
 import os
+import queue
 from app.config.settings import settings
 
 
+# Records for the log files are queued here and written by background
+# listener threads, so request handlers never block on disk I/O or rotation
+_file_queue = queue.SimpleQueue()
+_error_file_queue = queue.SimpleQueue()
+_listeners = []
+
+
 LOGGING_CONFIG = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -23,20 +33,14 @@ LOGGING_CONFIG = {
             'stream': 'ext://sys.stdout',
         },
         'file': {
-            'class': 'logging.handlers.RotatingFileHandler',
+            '()': 'logging.handlers.QueueHandler',
             'level': 'DEBUG',
-            'formatter': 'detailed',
-            'filename': '/app/storage/app.log',
-            'maxBytes': 10485760,  # 10MB
-            'backupCount': 5,
+            'queue': _file_queue,
         },
         'error_file': {
-            'class': 'logging.handlers.RotatingFileHandler',
+            '()': 'logging.handlers.QueueHandler',
             'level': 'ERROR',
-            'formatter': 'detailed',
-            'filename': '/app/storage/error.log',
-            'maxBytes': 10485760,  # 10MB
-            'backupCount': 5,
+            'queue': _error_file_queue,
         },
     },
     'loggers': {
@@ -68,6 +72,19 @@ LOGGING_CONFIG = {
 }
 
 
+# Rotating file handlers fed by the queues above, as (queue, filename, level)
+FILE_HANDLERS = [
+    (_file_queue, '/app/storage/app.log', logging.DEBUG),
+    (_error_file_queue, '/app/storage/error.log', logging.ERROR),
+]
+
+
+def _stop_listeners():
+    """Flush queued records and stop the listener threads"""
+    while _listeners:
+        _listeners.pop().stop()
+
+
 def setup_logging():
     """Setup logging configuration"""
     # Ensure log directory exists
@@ -76,6 +93,25 @@ def setup_logging():
     # Configure logging
     logging.config.dictConfig(LOGGING_CONFIG)
     
+    # Start one listener per log file to write queued records in the background
+    _stop_listeners()
+    formatter = logging.Formatter(LOGGING_CONFIG['formatters']['detailed']['format'])
+    for log_queue, filename, level in FILE_HANDLERS:
+        handler = logging.handlers.RotatingFileHandler(
+            filename,
+            maxBytes=10485760,  # 10MB
+            backupCount=5
+        )
+        handler.setLevel(level)
+        handler.setFormatter(formatter)
+        
+        listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+        listener.start()
+        _listeners.append(listener)
+    
     # Get logger and log startup message
     logger = logging.getLogger(__name__)
     logger.info("Logging configured successfully")
+
+
+atexit.register(_stop_listeners)
@@ -0,0 +1,59 @@
+import logging
+from typing import Dict, List
+
+import redis
+
+from app.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Progress entries are transient; the database keeps each file's final status
+PROGRESS_TTL = 3600  # 1 hour
+
+_redis = redis.Redis.from_url(settings.redis_url, decode_responses=True)
+
+
+def _progress_key(job_id: str) -> str:
+    return f"job:{job_id}:progress"
+
+
+def set_job_progress(job_id: str, states: Dict[str, str]):
+    """
+    Record progress entries for a job in its Redis hash, in one round-trip
+
+    Progress is informational only, so Redis errors are logged, never raised.
+    """
+    key = _progress_key(job_id)
+    try:
+        pipe = _redis.pipeline(transaction=False)
+        pipe.hset(key, mapping=states)
+        pipe.expire(key, PROGRESS_TTL)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning("Could not record progress for job %s: %s", job_id, e)
+
+
+def mark_files_in_progress(job_id: str, file_ids: List[str]):
+    """
+    Record in Redis that files of a job are being converted, instead of
+    writing an IN_PROGRESS status to the database
+    """
+    set_job_progress(job_id, {file_id: 'converting' for file_id in file_ids})
+
+
+def get_job_progress(job_id: str) -> Dict[str, str]:
+    """
+    Get a job's progress entries: file IDs being converted, and 'archive'
+    while the final archive is created. Empty once the job has finished.
+    """
+    return _redis.hgetall(_progress_key(job_id))
+
+
+def clear_job_progress(job_id: str):
+    """
+    Drop a job's progress entries once its final status is in the database
+    """
+    try:
+        _redis.delete(_progress_key(job_id))
+    except redis.RedisError as e:
+        logger.warning("Could not clear progress for job %s: %s", job_id, e)
@@ -16,24 +16,32 @@ celery_app = Celery(
 
 # Configure Celery
 celery_app.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    # msgpack is more compact than JSON for the batch result dicts a chord
+    # callback collects from the result backend
+    task_serializer='msgpack',
+    accept_content=['msgpack', 'json'],
+    result_serializer='msgpack',
+    result_accept_content=['msgpack', 'json'],
+    result_expires=3600,  # 1 hour
     timezone='UTC',
     enable_utc=True,
-    task_track_started=True,
     task_time_limit=30 * 60,  # 30 minutes
     task_soft_time_limit=25 * 60,  # 25 minutes
-    worker_prefetch_multiplier=1,
+    worker_concurrency=settings.celery_concurrency,
+    worker_prefetch_multiplier=settings.celery_prefetch_multiplier,
     task_acks_late=True,
+    task_acks_on_failure_or_timeout=True,
     worker_max_tasks_per_child=1000,
 )
 
-# Task routing removed - using default queue for simplicity
-# celery_app.conf.task_routes = {
-#     'app.workers.tasks.convert_docx_to_pdf': {'queue': 'conversion'},
-#     'app.workers.tasks.process_conversion_job': {'queue': 'job_processing'},
-#     'app.workers.tasks.create_final_archive': {'queue': 'archiving'},
-# }
+# Task routing - separate queues so job orchestration, conversions and
+# archiving each get their own consumers
+celery_app.conf.task_routes = {
+    'app.workers.tasks.convert_docx_batch': {'queue': 'convert'},
+    'app.workers.tasks.process_conversion_job': {'queue': 'jobs'},
+    'app.workers.tasks.create_final_archive': {'queue': 'archive'},
+    'app.workers.tasks.cleanup_job_files': {'queue': 'archive'},
+    'app.workers.tasks.mark_job_failed': {'queue': 'jobs'},
+}
 
 logger.info("Celery app configured successfully")
@@ -1,300 +1,443 @@
-from celery import current_task
+from celery import current_task, chord, group
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown
+from sqlalchemy import bindparam, case, lambda_stmt, select, update
 from sqlalchemy.orm import Session
+import math
 import os
 import uuid
 import logging
 from datetime import datetime
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 from app.workers.celery_app import celery_app
-from app.config.database import SessionLocal
+from app.config.database import SessionLocal, engine
 from app.models.models import ConversionJob, ConversionFile, JobStatus, FileStatus
 from app.utils.converter import converter
 from app.utils.file_utils import create_zip_archive, cleanup_directory
+from app.utils.progress import clear_job_progress, mark_files_in_progress, set_job_progress
 from app.config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Queries issued for every job; as lambda statements SQLAlchemy reuses their
+# compiled form without rebuilding and re-analysing the expression each time
+_FILES_BY_JOB = lambda_stmt(
+    lambda: select(
+        ConversionFile.id,
+        ConversionFile.filename,
+        ConversionFile.original_path,
+        ConversionFile.status
+    ).where(ConversionFile.job_id == bindparam('job_id'))
+)
+_COMPLETED_FILES_BY_JOB = lambda_stmt(
+    lambda: select(ConversionFile.filename, ConversionFile.converted_path).where(
+        ConversionFile.job_id == bindparam('job_id'),
+        ConversionFile.status == FileStatus.COMPLETED,
+        ConversionFile.converted_path.isnot(None)
+    )
+)
+
 
 def get_db_session():
-    """Get database session for tasks"""
+    """Get database session for tasks; use as a context manager so the
+    connection goes back to the pool as soon as the task is done"""
     return SessionLocal()
 
 
-@celery_app.task(bind=True, name='app.workers.tasks.convert_docx_to_pdf')
-def convert_docx_to_pdf(self, file_id: str, input_path: str, output_dir: str):
-    return _convert_docx_to_pdf_impl(file_id, input_path, output_dir, self)
+@worker_process_init.connect
+def reset_db_pool(**kwargs):
+    """Drop pooled connections inherited from the parent process after fork"""
+    engine.dispose(close=False)
+
+
+# Whether this worker consumes the convert queue; set in the parent process
+# before its pool forks, so only conversion workers keep a LibreOffice running
+_consumes_convert_queue = True
+
+
+@worker_init.connect
+def detect_convert_queue(sender, **kwargs):
+    """Record whether this worker was started to consume the convert queue"""
+    global _consumes_convert_queue
+    # The queues selected with -Q, or every declared queue when none were given
+    _consumes_convert_queue = 'convert' in sender.app.amqp.queues.consume_from
+
+
+@worker_process_init.connect
+def start_libreoffice(**kwargs):
+    """Start this worker process's own LibreOffice server before the first task"""
+    if not _consumes_convert_queue:
+        # Jobs and archive workers never convert; don't hold an idle soffice
+        return
+    
+    try:
+        converter.start()
+    except Exception as e:
+        # Conversions start it on demand or fall back to one-off processes
+        logger.warning("Could not start LibreOffice server: %s", e)
 
 
-def _convert_docx_to_pdf_impl(file_id: str, input_path: str, output_dir: str, task_context=None):
+@worker_process_shutdown.connect
+def stop_libreoffice(**kwargs):
+    """Stop this worker process's LibreOffice server"""
+    converter.shutdown()
+
+
+def _convert_file_batch(files: List[Tuple[str, str, str]], output_dir: str) -> Tuple[Dict[str, Tuple[str, str]], Dict[str, str]]:
     """
-    Convert a single DOCX file to PDF
+    Convert a batch of (file_id, filename, input_path) tuples with a single converter call
     
-    Args:
-        file_id: UUID of the file record in database
-        input_path: Path to the DOCX file
-        output_dir: Directory to save the PDF
+    Returns:
+        Tuple of (converted, failed) dicts mapping file_id to the
+        (filename, pdf_path) pair or the error message respectively
     """
-    db = get_db_session()
+    logger.info("Starting conversion of %s files", len(files))
     
+    results = {}
     try:
-        # Update task progress if task context is available
-        if task_context:
-            task_context.update_state(state='PROGRESS', meta={'status': 'Converting file'})
-        
-        # Get file record
-        file_record = db.query(ConversionFile).filter(
-            ConversionFile.id == uuid.UUID(file_id)
-        ).first()
-        
-        if not file_record:
-            logger.error(f"File record not found: {file_id}")
-            return {'status': 'ERROR', 'message': 'File record not found'}
-        
-        # Update file status to IN_PROGRESS
-        file_record.status = FileStatus.IN_PROGRESS
-        db.commit()
-        
-        logger.info(f"Starting conversion of {file_record.filename}")
-        
-        # Convert file
-        pdf_path = converter.convert_file(input_path, output_dir)
+        converter.convert_batch([input_path for _, _, input_path in files], output_dir, results)
+    except Exception as e:
+        # e.g. the soft time limit; the files converted so far still count
+        logger.error("Batch conversion interrupted after %s of %s files: %s", len(results), len(files), e)
+    
+    converted = {}
+    failed = {}
+    
+    for file_id, filename, input_path in files:
+        pdf_path = results.get(input_path)
         
-        if pdf_path and converter.validate_conversion(pdf_path):
-            # Successful conversion
-            file_record.status = FileStatus.COMPLETED
-            file_record.converted_path = pdf_path
-            file_record.completed_at = datetime.utcnow()
-            file_record.error_message = None
-            
-            logger.info(f"Successfully converted {file_record.filename}")
-            
-            result = {
-                'status': 'SUCCESS',
-                'file_id': file_id,
-                'pdf_path': pdf_path,
-                'original_filename': file_record.filename
-            }
+        if pdf_path:
+            converted[file_id] = (filename, pdf_path)
+            logger.info("Successfully converted %s", filename)
         else:
-            # Conversion failed
-            file_record.status = FileStatus.FAILED
-            file_record.error_message = "Conversion failed or produced invalid PDF"
-            
-            logger.error(f"Failed to convert {file_record.filename}")
-            
-            result = {
-                'status': 'FAILED',
-                'file_id': file_id,
-                'error': 'Conversion failed'
-            }
+            failed[file_id] = "Conversion failed or produced invalid PDF"
+            logger.error("Failed to convert %s", filename)
+    
+    return converted, failed
+
+
+def _record_file_results(db: Session, converted: Dict[str, Tuple[str, str]], failed: Dict[str, str]):
+    """
+    Store conversion outcomes with one UPDATE for successes and one for failures
+    """
+    if converted:
+        paths = {uuid.UUID(file_id): pdf_path for file_id, (_, pdf_path) in converted.items()}
+        db.execute(
+            update(ConversionFile)
+            .where(ConversionFile.id.in_(list(paths)))
+            .values(
+                status=FileStatus.COMPLETED,
+                converted_path=case(paths, value=ConversionFile.id),
+                completed_at=datetime.utcnow(),
+                error_message=None
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    if failed:
+        messages = {uuid.UUID(file_id): message for file_id, message in failed.items()}
+        db.execute(
+            update(ConversionFile)
+            .where(ConversionFile.id.in_(list(messages)))
+            .values(
+                status=FileStatus.FAILED,
+                error_message=case(messages, value=ConversionFile.id)
+            )
+            .execution_options(synchronize_session=False)
+        )
+    
+    db.commit()
+
+
+@celery_app.task(bind=True, name='app.workers.tasks.convert_docx_batch')
+def convert_docx_batch(self, job_id: str, files: List[Tuple[str, str, str]], output_dir: str):
+    """
+    Convert a batch of files from one job
+    
+    The caller passes each file's fields, so no lookup is needed here, and
+    outcomes are returned to the chord callback, which records them for
+    the whole job at once. Files are marked in progress in Redis only, so
+    the task doesn't write to the database at all.
+    
+    Args:
+        job_id: UUID of the job the files belong to
+        files: (file_id, filename, input_path) for each file
+        output_dir: Directory to save the PDFs
+    """
+    try:
+        mark_files_in_progress(job_id, [file_id for file_id, _, _ in files])
         
-        db.commit()
-        return result
+        converted, failed = _convert_file_batch(files, output_dir)
         
     except Exception as e:
-        logger.error(f"Error in convert_docx_to_pdf task: {str(e)}")
-        
-        # Update file status to failed
-        try:
-            if 'file_record' in locals():
-                file_record.status = FileStatus.FAILED
-                file_record.error_message = str(e)
-                db.commit()
-        except:
-            pass
-        
-        return {'status': 'ERROR', 'message': str(e)}
+        logger.error("Error in convert_docx_batch task: %s", e)
+        converted, failed = {}, {file_id: str(e) for file_id, _, _ in files}
     
-    finally:
-        db.close()
+    return {
+        'status': 'SUCCESS',
+        'converted': converted,
+        'failed': failed
+    }
 
 
-@celery_app.task(bind=True, name='app.workers.tasks.process_conversion_job')
+@celery_app.task(bind=True, name='app.workers.tasks.process_conversion_job', ignore_result=True)
 def process_conversion_job(self, job_id: str):
     """
-    Process all files in a conversion job
+    Fan out the conversion of all files in a job across the worker pool
+    
+    Pending files are split into batches, each converted by its own
+    convert_docx_batch task; create_final_archive runs once all of them
+    have finished and records the job's final status. A job with a single
+    pending file chains its one batch straight into the archive task,
+    without a chord's group bookkeeping.
     
     Args:
         job_id: UUID of the job to process
     """
-    db = get_db_session()
+    job_uuid = uuid.UUID(job_id)
     
-    try:
-        # Update task progress
-        self.update_state(state='PROGRESS', meta={'status': 'Processing job'})
-        
-        # Get job record
-        job = db.query(ConversionJob).filter(
-            ConversionJob.id == uuid.UUID(job_id)
-        ).first()
-        
-        if not job:
-            logger.error(f"Job not found: {job_id}")
-            return {'status': 'ERROR', 'message': 'Job not found'}
-        
-        # Update job status
-        job.status = JobStatus.IN_PROGRESS
-        db.commit()
-        
-        logger.info(f"Processing job {job_id} with {job.file_count} files")
-        
-        # Create output directory for this job
-        job_output_dir = os.path.join(settings.full_temp_path, f"job_{job_id}_output")
-        os.makedirs(job_output_dir, exist_ok=True)
-        
-        # Get all files for this job
-        files = db.query(ConversionFile).filter(
-            ConversionFile.job_id == uuid.UUID(job_id)
-        ).all()
-        
-        if not files:
-            job.status = JobStatus.FAILED
-            job.error_message = "No files found in job"
+    with get_db_session() as db:
+        try:
+            # Get job record
+            job = db.get(ConversionJob, job_uuid)
+            
+            if not job:
+                logger.error("Job not found: %s", job_id)
+                return {'status': 'ERROR', 'message': 'Job not found'}
+            
+            # Update job status
+            job.status = JobStatus.IN_PROGRESS
             db.commit()
-            return {'status': 'ERROR', 'message': 'No files found'}
-        
-        # Process each file by calling convert tasks directly
-        # We can't use .delay().get() pattern within a task, so we'll call the function directly
-        completed_files = 0
-        failed_files = 0
-        
-        for file_record in files:
-            if file_record.status == FileStatus.PENDING:
+            
+            logger.info("Processing job %s with %s files", job_id, job.file_count)
+            
+            # Create output directory for this job
+            job_output_dir = os.path.join(settings.full_temp_path, f"job_{job_id}_output")
+            os.makedirs(job_output_dir, exist_ok=True)
+            
+            # Get all files for this job as plain rows; only these columns are read
+            files = db.execute(_FILES_BY_JOB, {'job_id': job_uuid}).all()
+            
+            if not files:
+                job.status = JobStatus.FAILED
+                job.error_message = "No files found in job"
+                db.commit()
+                return {'status': 'ERROR', 'message': 'No files found'}
+            
+            # Hand each batch task the fields it needs so it doesn't query them again
+            pending_files = [
+                (str(f.id), f.filename, f.original_path)
+                for f in files if f.status == FileStatus.PENDING
+            ]
+            
+            if not pending_files:
+                job.status = JobStatus.FAILED
+                job.error_message = "All file conversions failed"
+                db.commit()
+                logger.error("Job %s failed - no pending files to convert", job_id)
+                return {'status': 'ERROR', 'message': 'No pending files'}
+            
+            if len(pending_files) == 1:
+                # A one-task chord still pays for the group result and the
+                # unlock polling; a chain hands the result over directly
+                (
+                    convert_docx_batch.s(job_id, pending_files, job_output_dir).set(queue='convert')
+                    | create_final_archive.s(job_id)
+                ).on_error(mark_job_failed.s(job_id)).apply_async()
+                
+                logger.info("Dispatched the only file of job %s", job_id)
+                
+                return {
+                    'status': 'SUCCESS',
+                    'job_id': job_id,
+                    'batches': 1
+                }
+            
+            # Batches share LibreOffice startup across files, but small jobs are
+            # split so every worker process gets a share of the work
+            batch_size = max(1, min(
+                settings.conversion_batch_size,
+                math.ceil(len(pending_files) / max(1, settings.conversion_parallelism))
+            ))
+            header = group(
+                convert_docx_batch.s(job_id, pending_files[start:start + batch_size], job_output_dir)
+                for start in range(0, len(pending_files), batch_size)
+            )
+            callback = create_final_archive.s(job_id).on_error(mark_job_failed.s(job_id))
+            chord(header)(callback)
+            
+            logger.info("Dispatched %s conversion batches for job %s", len(header.tasks), job_id)
+            
+            return {
+                'status': 'SUCCESS',
+                'job_id': job_id,
+                'batches': len(header.tasks)
+            }
+            
+        except Exception as e:
+            logger.error("Error in process_conversion_job task: %s", e)
+            
+            # Update job status to failed
+            try:
+                if 'job' in locals():
+                    job.status = JobStatus.FAILED
+                    job.error_message = str(e)
+                    db.commit()
+            except:
+                pass
+            
+            return {'status': 'ERROR', 'message': str(e)}
+
+
+@celery_app.task(bind=True, name='app.workers.tasks.create_final_archive', ignore_result=True)
+def create_final_archive(self, results: List[dict], job_id: str):
+    """
+    Chord callback: archive the converted PDFs and record the job's final status
+    
+    Args:
+        results: Return values of the job's convert_docx_batch tasks, or the
+            single return value when a one-file job chains its batch here
+        job_id: UUID of the job
+    """
+    if isinstance(results, dict):
+        results = [results]
+    
+    converted = {}
+    failed = {}
+    for result in results:
+        converted.update(result.get('converted', {}))
+        failed.update(result.get('failed', {}))
+    
+    completed_files = len(converted)
+    failed_files = len(failed)
+    
+    logger.info("Job %s: %s completed, %s failed", job_id, completed_files, failed_files)
+    
+    with get_db_session() as db:
+        try:
+            job = db.get(ConversionJob, uuid.UUID(job_id))
+            
+            if not job:
+                logger.error("Job not found: %s", job_id)
+                return {'status': 'ERROR', 'message': 'Job not found'}
+            
+            # Record every file's outcome in two statements
+            _record_file_results(db, converted, failed)
+            
+            if completed_files > 0:
                 try:
-                    # Call conversion implementation function directly
-                    result = _convert_docx_to_pdf_impl(
-                        str(file_record.id),
-                        file_record.original_path,
-                        job_output_dir
-                    )
+                    # The batches already reported each PDF, so no need to query them again
+                    archive_result = _create_final_archive_impl(job_id, list(converted.values()))
                     
-                    if result['status'] == 'SUCCESS':
-                        completed_files += 1
+                    if archive_result.get('status') == 'SUCCESS':
+                        job.status = JobStatus.COMPLETED
+                        job.completed_at = datetime.utcnow()
+                        job.output_zip_path = archive_result.get('zip_path')
+                        logger.info("Job %s completed successfully", job_id)
                     else:
-                        failed_files += 1
-                        
+                        job.status = JobStatus.FAILED
+                        job.error_message = "Failed to create final archive"
+                        logger.error("Job %s failed during archiving", job_id)
                 except Exception as e:
-                    logger.error(f"Conversion failed for {file_record.filename}: {str(e)}")
-                    failed_files += 1
-        
-        logger.info(f"Job {job_id}: {completed_files} completed, {failed_files} failed out of {len(files)}")
-        
-        # Refresh job data
-        db.refresh(job)
-        
-        if completed_files > 0:
-            # Create final ZIP archive by calling the function directly
-            try:
-                archive_result = _create_final_archive_impl(job_id)
-                
-                if archive_result.get('status') == 'SUCCESS':
-                    job.status = JobStatus.COMPLETED
-                    job.completed_at = datetime.utcnow()
-                    job.output_zip_path = archive_result.get('zip_path')
-                    logger.info(f"Job {job_id} completed successfully")
-                else:
                     job.status = JobStatus.FAILED
-                    job.error_message = "Failed to create final archive"
-                    logger.error(f"Job {job_id} failed during archiving")
-            except Exception as e:
-                job.status = JobStatus.FAILED
-                job.error_message = f"Error creating archive: {str(e)}"
-                logger.error(f"Job {job_id} failed during archiving: {str(e)}")
-        else:
-            # All files failed
-            job.status = JobStatus.FAILED
-            job.error_message = "All file conversions failed"
-            logger.error(f"Job {job_id} failed - all conversions failed")
-        
-        db.commit()
-        
-        return {
-            'status': 'SUCCESS',
-            'job_id': job_id,
-            'completed_files': completed_files,
-            'failed_files': failed_files,
-            'final_status': job.status.value
-        }
-        
-    except Exception as e:
-        logger.error(f"Error in process_conversion_job task: {str(e)}")
-        
-        # Update job status to failed
-        try:
-            if 'job' in locals():
+                    job.error_message = f"Error creating archive: {str(e)}"
+                    logger.error("Job %s failed during archiving: %s", job_id, e)
+            else:
+                # All files failed
                 job.status = JobStatus.FAILED
-                job.error_message = str(e)
-                db.commit()
-        except:
-            pass
-        
-        return {'status': 'ERROR', 'message': str(e)}
-    
-    finally:
-        db.close()
+                job.error_message = "All file conversions failed"
+                logger.error("Job %s failed - all conversions failed", job_id)
+            
+            db.commit()
+            clear_job_progress(job_id)
+            
+            return {
+                'status': 'SUCCESS',
+                'job_id': job_id,
+                'completed_files': completed_files,
+                'failed_files': failed_files,
+                'final_status': job.status.value
+            }
+            
+        except Exception as e:
+            logger.error("Error in create_final_archive task: %s", e)
+            
+            # Update job status to failed
+            try:
+                if 'job' in locals():
+                    job.status = JobStatus.FAILED
+                    job.error_message = str(e)
+                    db.commit()
+            except:
+                pass
+            
+            return {'status': 'ERROR', 'message': str(e)}
 
 
-@celery_app.task(bind=True, name='app.workers.tasks.create_final_archive')
-def create_final_archive(self, job_id: str):
-    return _create_final_archive_impl(job_id, self)
+@celery_app.task(name='app.workers.tasks.mark_job_failed', ignore_result=True)
+def mark_job_failed(request, exc, traceback, job_id: str):
+    """
+    Error callback for the job's chord: a conversion batch or the final
+    archive task crashed, so record the job as failed instead of leaving
+    it in progress
+    """
+    logger.error("Job %s failed: %s", job_id, exc)
+    
+    with get_db_session() as db:
+        job = db.get(ConversionJob, uuid.UUID(job_id))
+        
+        if job and job.status != JobStatus.COMPLETED:
+            job.status = JobStatus.FAILED
+            job.error_message = str(exc)
+            db.commit()
+    
+    clear_job_progress(job_id)
 
 
-def _create_final_archive_impl(job_id: str, task_context=None):
+def _create_final_archive_impl(job_id: str, files_to_archive: List[Tuple[str, str]] = None):
     """
     Create final ZIP archive with all converted PDFs
     
     Args:
         job_id: UUID of the job
+        files_to_archive: (original_filename, pdf_path) of each converted file,
+            as reported by the conversion tasks; read from the database if not given
     """
-    db = get_db_session()
+    job_uuid = uuid.UUID(job_id)
     
     try:
-        # Update task progress if task context is available
-        if task_context:
-            task_context.update_state(state='PROGRESS', meta={'status': 'Creating archive'})
-        
-        # Get job record
-        job = db.query(ConversionJob).filter(
-            ConversionJob.id == uuid.UUID(job_id)
-        ).first()
-        
-        if not job:
-            logger.error(f"Job not found: {job_id}")
-            return {'status': 'ERROR', 'message': 'Job not found'}
-        
-        # Get all successfully converted files
-        completed_files = db.query(ConversionFile).filter(
-            ConversionFile.job_id == uuid.UUID(job_id),
-            ConversionFile.status == FileStatus.COMPLETED,
-            ConversionFile.converted_path.isnot(None)
-        ).all()
-        
-        if not completed_files:
-            logger.error(f"No completed files found for job {job_id}")
-            return {'status': 'ERROR', 'message': 'No completed files found'}
-        
-        # Prepare files for archiving
-        files_to_archive = []
-        for file_record in completed_files:
-            if os.path.exists(file_record.converted_path):
-                files_to_archive.append((
-                    file_record.filename,
-                    file_record.converted_path
-                ))
+        set_job_progress(job_id, {'archive': 'creating'})
         
         if not files_to_archive:
-            logger.error(f"No valid PDF files found for job {job_id}")
-            return {'status': 'ERROR', 'message': 'No valid PDF files found'}
+            with get_db_session() as db:
+                # Get job record
+                job = db.get(ConversionJob, job_uuid)
+                
+                if not job:
+                    logger.error("Job not found: %s", job_id)
+                    return {'status': 'ERROR', 'message': 'Job not found'}
+                
+                # Get all successfully converted files as plain rows
+                completed_files = db.execute(_COMPLETED_FILES_BY_JOB, {'job_id': job_uuid}).all()
+            
+            if not completed_files:
+                logger.error("No completed files found for job %s", job_id)
+                return {'status': 'ERROR', 'message': 'No completed files found'}
+            
+            files_to_archive = [
+                (file_record.filename, file_record.converted_path)
+                for file_record in completed_files
+            ]
         
-        # Create ZIP archive
+        # Create ZIP archive; missing or empty PDFs are skipped by create_zip_archive itself
         archive_filename = f"converted_files_{job_id}.zip"
         archive_path = os.path.join(settings.full_output_path, archive_filename)
         
-        logger.info(f"Creating archive with {len(files_to_archive)} files: {archive_path}")
+        logger.info("Creating archive with %s files: %s", len(files_to_archive), archive_path)
         
         final_archive_path = create_zip_archive(files_to_archive, archive_path)
         
-        logger.info(f"Successfully created archive for job {job_id}: {final_archive_path}")
+        logger.info("Successfully created archive for job %s: %s", job_id, final_archive_path)
         
         return {
             'status': 'SUCCESS',
@@ -303,14 +446,11 @@ def _create_final_archive_impl(job_id: str, task_context=None):
         }
         
     except Exception as e:
-        logger.error(f"Error in create_final_archive task: {str(e)}")
+        logger.error("Error in create_final_archive task: %s", e)
         return {'status': 'ERROR', 'message': str(e)}
-    
-    finally:
-        db.close()
 
 
-@celery_app.task(name='app.workers.tasks.cleanup_job_files')
+@celery_app.task(name='app.workers.tasks.cleanup_job_files', ignore_result=True)
 def cleanup_job_files(job_id: str, max_age_days: int = 7):
     """
     Clean up temporary files for a job
@@ -327,10 +467,10 @@ def cleanup_job_files(job_id: str, max_age_days: int = 7):
         cleanup_directory(input_dir)
         cleanup_directory(output_dir)
         
-        logger.info(f"Cleaned up temporary files for job {job_id}")
+        logger.info("Cleaned up temporary files for job %s", job_id)
         
         return {'status': 'SUCCESS', 'message': f'Cleaned up job {job_id}'}
         
     except Exception as e:
-        logger.error(f"Error in cleanup_job_files task: {str(e)}")
+        logger.error("Error in cleanup_job_files task: %s", e)
         return {'status': 'ERROR', 'message': str(e)}
@@ -2,7 +2,7 @@
 
 echo "Installing system dependencies..."
 apt-get update
-apt-get install -y libreoffice fonts-liberation fonts-dejavu
+apt-get install -y libreoffice fonts-liberation fonts-dejavu libarchive13
 
 echo "Installing Python dependencies..."
 pip install -r requirements.txt
@@ -12,9 +12,9 @@ mkdir -p /tmp/storage/{uploads,outputs,temp}
 
 echo "Running database migrations..."
 python -c "
-from app.config.database import engine, Base
+from app.config.database import create_schema
 from app.models.models import ConversionJob, ConversionFile
-Base.metadata.create_all(bind=engine)
+create_schema()
 print('Database tables created')
 "
 
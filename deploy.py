@@ -7,12 +7,85 @@ Usage: python deploy.py --api-key YOUR_RENDER_API_KEY --repo-url https://github.
 """
 
 import requests
+import hashlib
+import heapq
 import json
+import os
+import tempfile
 import time
 import argparse
+import random
+import socket
 import sys
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime as _dt
+from pathlib import Path
 from typing import Dict, Any
 
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    # orjson is optional; fall back to the stdlib encoder
+    _json_dumps = lambda data: json.dumps(data).encode()
+    _json_loads = json.loads
+
+_STRFTIME = "%Y-%m-%d %H:%M:%S"
+
+# Owner IDs never change for an API key, so they're cached between runs
+OWNER_CACHE_DIR = Path.home() / ".cache" / "render_deployer"
+OWNER_CACHE_TTL = 24 * 60 * 60  # 24 hours
+
+# Probe idle pooled connections so they survive the quiet stretches between
+# polls instead of being dropped by NATs and load balancers
+_KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+]
+if hasattr(socket, "TCP_KEEPIDLE"):
+    _KEEPALIVE_SOCKET_OPTIONS += [
+        (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 20)
+    ]
+
+# Name, endpoint, status getter, and ready and failed statuses for each
+# kind of service RenderDeployer.wait polls
+_WAIT_SPECS = {
+    "postgres": (
+        "PostgreSQL",
+        "postgres/{id}",
+        lambda service: service.get("status", "unknown"),
+        {"available"},
+        {"failed", "suspended"}
+    ),
+    "redis": (
+        "Redis",
+        "redis/{id}",
+        lambda service: service.get("status", "unknown"),
+        {"available"},
+        {"failed", "suspended"}
+    ),
+    "service": (
+        "Render",
+        "services/{id}",
+        lambda service: service.get("service", {}).get("status", "unknown"),
+        {"available", "running"},
+        {"failed", "suspended"}
+    ),
+}
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections send TCP keep-alives"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = _KEEPALIVE_SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
 
 class RenderDeployer:
     def __init__(self, api_key: str, repo_url: str):
@@ -23,17 +96,46 @@ class RenderDeployer:
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        # Reuse pooled keep-alive connections to the API across requests and
+        # polls, retrying transient errors; POSTs carry an idempotency key
+        # (see make_request), so they're retried too. Every call goes to one
+        # host, so a single pool sized for the two threads that talk to it at
+        # once keeps the socket count down.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = _KeepAliveAdapter(
+            pool_connections=1,
+            pool_maxsize=2,
+            max_retries=Retry(
+                total=5,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"}
+            )
+        )
+        self.session.mount("https://", adapter)
+        # Web and worker services are created from worker threads; guard
+        # writes to the shared services dict
         self.services = {}
+        self._services_lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        # Environment shared by the web and worker services, built on first
+        # use; a tuple, so each service's payload gets its own list
+        self._base_env_vars = None
+        # Connection strings, set once each database is available
+        self.database_url = None
+        self.redis_url = None
         self.owner_id = None
         # Add timestamp to avoid naming conflicts
-        import time
         self.timestamp = str(int(time.time()))
     
     def log(self, message: str, level: str = "INFO"):
         """Log messages with timestamp"""
-        import datetime
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{timestamp}] {level}: {message}")
+        timestamp = _dt.now().strftime(_STRFTIME)
+        # Steps run concurrently, so tag each line with the thread it came
+        # from and keep lines from different threads from interleaving
+        with self._log_lock:
+            print(f"[{timestamp}] [{threading.current_thread().name}] {level}: {message}")
     
     def get_owner_id(self) -> str:
         """Get the owner ID for the authenticated user"""
@@ -56,127 +158,191 @@ class RenderDeployer:
             self.log(f"Failed to get owner ID: {e}", "ERROR")
             raise
     
+    def _cached_owner_id(self) -> str:
+        """
+        Get the owner ID, reusing the one cached on disk for this API key for
+        up to a day instead of asking the API on every deploy
+        """
+        key = hashlib.sha256(self.api_key.encode()).hexdigest()[:16]
+        cache_path = OWNER_CACHE_DIR / f"{key}.json"
+        
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if time.time() - cached["ts"] < OWNER_CACHE_TTL:
+                self.owner_id = cached["owner_id"]
+                self.log(f"Using cached owner ID: {self.owner_id}")
+                return self.owner_id
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        
+        owner_id = self.get_owner_id()
+        
+        # Write to a temporary file and rename so a concurrent run never
+        # reads a partial cache entry
+        try:
+            OWNER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=OWNER_CACHE_DIR, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"ts": time.time(), "owner_id": owner_id}, f)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            self.log(f"Could not cache owner ID: {e}", "WARNING")
+        
+        return owner_id
+    
     def make_request(self, method: str, endpoint: str, data: Dict = None) -> Dict[str, Any]:
         """Make API request to Render"""
         url = f"{self.base_url}/{endpoint}"
+        body = None if data is None else _json_dumps(data)
+        headers = None
+        if body is not None and method.upper() == "POST":
+            # A retried creation sends the same key, so Render won't create it twice
+            headers = {"Idempotency-Key": hashlib.sha256(body).hexdigest()}
         
         try:
-            if method.upper() == "GET":
-                response = requests.get(url, headers=self.headers)
-            elif method.upper() == "POST":
-                response = requests.post(url, headers=self.headers, json=data)
-            elif method.upper() == "PUT":
-                response = requests.put(url, headers=self.headers, json=data)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
+            response = self.session.request(
+                method.upper(),
+                url,
+                data=body,
+                headers=headers,
+                timeout=30
+            )
             response.raise_for_status()
-            return response.json()
+            return _json_loads(response.content)
             
         except requests.exceptions.RequestException as e:
             self.log(f"API request failed: {e}", "ERROR")
-            if hasattr(e.response, 'text'):
-                self.log(f"Response: {e.response.text}", "ERROR")
+            if e.response is not None:
+                # Log at most the first 4KB of the error body, undecoded by charset detection
+                body = e.response.content[:4096].decode("utf-8", errors="replace")
+                self.log(f"Response: {body}", "ERROR")
             raise
     
-    def wait_for_service(self, service_id: str, service_type: str, timeout: int = 600):
-        """Wait for a service to be ready"""
-        self.log(f"Waiting for {service_type} service {service_id} to be ready...")
+    def _poll_many(self, waits: Dict[str, tuple], timeout: int = 600) -> Dict[str, Any]:
+        """
+        Poll several API endpoints from this one thread until each reports a
+        ready or failed status
         
+        waits maps a name to (endpoint, status_fn, ready, failed). Each
+        endpoint backs off on its own schedule, exponentially from 2s up to
+        30s with jitter, and the thread only sleeps until the next check is
+        due. Returns each name's last response once ready, or None on
+        failure or timeout.
+        """
         start_time = time.time()
-        while time.time() - start_time < timeout:
+        deadline = start_time + timeout
+        results = {name: None for name in waits}
+        delays = {name: 2 for name in waits}
+        # (next check time, name); every endpoint is checked straight away
+        schedule = [(start_time, name) for name in waits]
+        heapq.heapify(schedule)
+        
+        while schedule:
+            due, name = heapq.heappop(schedule)
+            if due >= deadline:
+                self.log(f"Timeout waiting for {name} to be ready", "ERROR")
+                continue
+            
+            time.sleep(max(0, due - time.time()))
+            endpoint, status_fn, ready, failed = waits[name]
             try:
-                if service_type in ["pserv", "redis"]:
-                    endpoint = f"services/{service_id}"
-                else:
-                    endpoint = f"services/{service_id}"
-                
-                service = self.make_request("GET", endpoint)
-                status = service.get("service", {}).get("status", "unknown")
-                
-                self.log(f"{service_type} status: {status}")
+                response = self.make_request("GET", endpoint)
+                status = status_fn(response)
                 
-                if status in ["available", "running"]:
-                    self.log(f"{service_type} is ready!")
-                    return service
-                elif status in ["failed", "suspended"]:
-                    self.log(f"{service_type} deployment failed with status: {status}", "ERROR")
-                    return None
+                self.log(f"{name} status: {status}")
                 
-                time.sleep(30)  # Wait 30 seconds before checking again
+                if status in ready:
+                    self.log(f"{name} is ready!")
+                    results[name] = response
+                    continue
+                elif status in failed:
+                    self.log(f"{name} deployment failed with status: {status}", "ERROR")
+                    continue
                 
             except Exception as e:
-                self.log(f"Error checking service status: {e}", "ERROR")
-                time.sleep(30)
+                self.log(f"Error checking {name} status: {e}", "ERROR")
+            
+            # Don't schedule a check past the deadline
+            delay = delays[name]
+            pause = delay + random.uniform(0, 0.5 * delay)
+            delays[name] = min(delay * 1.7, 30)
+            heapq.heappush(schedule, (min(time.time() + pause, deadline), name))
         
-        self.log(f"Timeout waiting for {service_type} to be ready", "ERROR")
-        return None
+        return results
     
-    def wait_for_postgres_service(self, service_id: str, timeout: int = 600):
-        """Wait for a PostgreSQL service to be ready"""
-        self.log(f"Waiting for PostgreSQL service {service_id} to be ready...")
-        
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                service = self.make_request("GET", f"postgres/{service_id}")
-                status = service.get("status", "unknown")
-                
-                self.log(f"PostgreSQL status: {status}")
-                
-                if status == "available":
-                    self.log("PostgreSQL is ready!")
-                    # Update connection info
-                    self.services["database"]["connection_info"] = service
-                    self.log(f"PostgreSQL connection string: {service.get('connectionString', 'NOT_FOUND')}")
-                    return service
-                elif status in ["failed", "suspended"]:
-                    self.log(f"PostgreSQL deployment failed with status: {status}", "ERROR")
-                    return None
-                
-                time.sleep(30)  # Wait 30 seconds before checking again
-                
-            except Exception as e:
-                self.log(f"Error checking PostgreSQL status: {e}", "ERROR")
-                time.sleep(30)
+    def wait(self, kind: str, service_id: str, name: str = None, timeout: int = 600):
+        """
+        Wait for a service to be ready, using the _WAIT_SPECS entry for its
+        kind ("postgres", "redis" or "service"). Returns the service info, or
+        None if it failed or timed out.
+        """
+        name = name or _WAIT_SPECS[kind][0]
+        self.log(f"Waiting for {name} service {service_id} to be ready...")
         
-        self.log(f"Timeout waiting for PostgreSQL to be ready", "ERROR")
-        return None
+        service = self._poll_many({name: self._wait_spec(kind, service_id)}, timeout)[name]
+        self._record_ready(kind, service)
+        return service
     
-    def wait_for_redis_service(self, service_id: str, timeout: int = 600):
-        """Wait for a Redis service to be ready"""
-        self.log(f"Waiting for Redis service {service_id} to be ready...")
+    def wait_for_databases(self, db_id: str, redis_id: str, timeout: int = 600):
+        """
+        Wait for the PostgreSQL and Redis services together, polling both
+        from this thread. A service whose creation response already reported
+        it available isn't polled. Returns whether each of (PostgreSQL, Redis)
+        is ready.
+        """
+        waits = {}
+        if self.services["database"].get("status") != "available":
+            waits["PostgreSQL"] = self._wait_spec("postgres", db_id)
+        if self.services["redis"].get("status") != "available":
+            waits["Redis"] = self._wait_spec("redis", redis_id)
         
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                service = self.make_request("GET", f"redis/{service_id}")
-                status = service.get("status", "unknown")
-                
-                self.log(f"Redis status: {status}")
-                
-                if status == "available":
-                    self.log("Redis is ready!")
-                    # Update connection string
-                    connection_string = service.get("connectionString")
-                    self.services["redis"]["connection_string"] = connection_string
-                    self.log(f"Redis connection string: {connection_string or 'NOT_FOUND'}")
-                    return service
-                elif status in ["failed", "suspended"]:
-                    self.log(f"Redis deployment failed with status: {status}", "ERROR")
-                    return None
-                
-                time.sleep(30)  # Wait 30 seconds before checking again
-                
-            except Exception as e:
-                self.log(f"Error checking Redis status: {e}", "ERROR")
-                time.sleep(30)
+        if waits:
+            self.log(f"Waiting for {' and '.join(waits)} to be ready...")
+            results = self._poll_many(waits, timeout)
+            self._record_ready("postgres", results.get("PostgreSQL"))
+            self._record_ready("redis", results.get("Redis"))
         
-        self.log(f"Timeout waiting for Redis to be ready", "ERROR")
-        return None
+        return (
+            self.services["database"].get("status") == "available",
+            self.services["redis"].get("status") == "available"
+        )
+    
+    @staticmethod
+    def _wait_spec(kind: str, service_id: str) -> tuple:
+        """_poll_many wait for one service of a _WAIT_SPECS kind"""
+        _, endpoint, status_fn, ready, failed = _WAIT_SPECS[kind]
+        return endpoint.format(id=service_id), status_fn, ready, failed
+    
+    def _record_ready(self, kind: str, service):
+        """Record the connection details of a database that became ready"""
+        if kind == "postgres":
+            self._store_postgres_info(service)
+        elif kind == "redis":
+            self._store_redis_info(service)
+    
+    def _store_postgres_info(self, service):
+        """Record a ready PostgreSQL service's connection string"""
+        if service:
+            with self._services_lock:
+                self.services["database"]["status"] = service.get("status")
+                self.database_url = service.get("connectionString")
+            self.log(f"PostgreSQL connection string: {self.database_url or 'NOT_FOUND'}")
     
-    def create_postgresql_database(self) -> str:
-        """Create PostgreSQL database"""
+    def _store_redis_info(self, service):
+        """Record a ready Redis service's connection string"""
+        if service:
+            with self._services_lock:
+                self.services["redis"]["status"] = service.get("status")
+                self.redis_url = service.get("connectionString")
+            self.log(f"Redis connection string: {self.redis_url or 'NOT_FOUND'}")
+    
+    def create_postgresql_database(self, wait: bool = True) -> str:
+        """Create PostgreSQL database, by default waiting until it is ready"""
         self.log("Creating PostgreSQL database...")
         
         if not self.owner_id:
@@ -196,15 +362,20 @@ class RenderDeployer:
             # Use the correct endpoint for PostgreSQL databases
             result = self.make_request("POST", "postgres", postgres_config)
             service_id = result["id"]
-            self.services["database"] = {
-                "id": service_id,
-                "connection_info": result
-            }
+            with self._services_lock:
+                self.services["database"] = {"id": service_id}
             
             self.log(f"PostgreSQL database created with ID: {service_id}")
             
+            # Nothing to wait for if the database is already up
+            if result.get("status") == "available":
+                self._store_postgres_info(result)
+                return service_id
+            if not wait:
+                return service_id
+            
             # Wait for database to be ready
-            service_info = self.wait_for_postgres_service(service_id)
+            service_info = self.wait("postgres", service_id)
             if service_info:
                 return service_id
             else:
@@ -214,8 +385,8 @@ class RenderDeployer:
             self.log(f"Failed to create PostgreSQL database: {e}", "ERROR")
             raise
     
-    def create_redis_database(self) -> str:
-        """Create Redis database"""
+    def create_redis_database(self, wait: bool = True) -> str:
+        """Create Redis database, by default waiting until it is ready"""
         self.log("Creating Redis database...")
         
         if not self.owner_id:
@@ -232,15 +403,20 @@ class RenderDeployer:
             # Use the correct endpoint for Redis databases  
             result = self.make_request("POST", "redis", redis_config)
             service_id = result["id"]
-            self.services["redis"] = {
-                "id": service_id,
-                "connection_string": result.get("connectionString")
-            }
+            with self._services_lock:
+                self.services["redis"] = {"id": service_id}
             
             self.log(f"Redis database created with ID: {service_id}")
             
+            # Nothing to wait for if Redis is already up
+            if result.get("status") == "available":
+                self._store_redis_info(result)
+                return service_id
+            if not wait:
+                return service_id
+            
             # Wait for Redis to be ready
-            service_info = self.wait_for_redis_service(service_id)
+            service_info = self.wait("redis", service_id)
             if service_info:
                 return service_id
             else:
@@ -250,24 +426,30 @@ class RenderDeployer:
             self.log(f"Failed to create Redis database: {e}", "ERROR")
             raise
     
+    def _build_base_env_vars(self) -> tuple:
+        """
+        Build the environment variables shared by the web and worker services,
+        checking that both databases are ready
+        """
+        if not self.database_url or not self.redis_url:
+            raise Exception(f"Database services not ready. DB: {bool(self.database_url)}, Redis: {bool(self.redis_url)}")
+        
+        return (
+            {"key": "DATABASE_URL", "value": self.database_url},
+            {"key": "REDIS_URL", "value": self.redis_url},
+            {"key": "CELERY_BROKER_URL", "value": self.redis_url},
+            {"key": "CELERY_RESULT_BACKEND", "value": self.redis_url},
+            {"key": "STORAGE_PATH", "value": "/tmp/storage"},
+            {"key": "PYTHONPATH", "value": "/opt/render/project/src"}
+        )
+    
     def create_web_service(self) -> str:
         """Create FastAPI web service"""
         self.log("Creating FastAPI web service...")
         
-        # Get database connection string
-        db_info = self.services.get("database", {}).get("connection_info", {})
-        redis_connection = self.services.get("redis", {}).get("connection_string")
-        
-        self.log(f"DEBUG: db_info keys: {list(db_info.keys()) if db_info else 'None'}")
-        self.log(f"DEBUG: redis_connection: {redis_connection or 'None'}")
-        
-        if not db_info or not redis_connection:
-            raise Exception(f"Database services not ready. DB: {bool(db_info)}, Redis: {bool(redis_connection)}")
-        
-        # Use the connection string directly from PostgreSQL service
-        database_url = db_info.get("connectionString")
-        if not database_url:
-            raise Exception("PostgreSQL connection string not available")
+        # Web and worker are created concurrently; build the shared vars once
+        with self._services_lock:
+            self._base_env_vars = self._base_env_vars or self._build_base_env_vars()
         
         if not self.owner_id:
             raise Exception("Owner ID not set. Call get_owner_id() first.")
@@ -282,20 +464,16 @@ class RenderDeployer:
             "buildCommand": "./build.sh",
             "startCommand": "python -m app.main",
             "envVars": [
-                {"key": "DATABASE_URL", "value": database_url},
-                {"key": "REDIS_URL", "value": redis_connection},
-                {"key": "CELERY_BROKER_URL", "value": redis_connection},
-                {"key": "CELERY_RESULT_BACKEND", "value": redis_connection},
-                {"key": "API_HOST", "value": "0.0.0.0"},
-                {"key": "STORAGE_PATH", "value": "/tmp/storage"},
-                {"key": "PYTHONPATH", "value": "/opt/render/project/src"}
+                *self._base_env_vars,
+                {"key": "API_HOST", "value": "0.0.0.0"}
             ]
         }
         
         try:
             result = self.make_request("POST", "services", web_config)
             service_id = result["service"]["id"]
-            self.services["web"] = {"id": service_id}
+            with self._services_lock:
+                self.services["web"] = {"id": service_id}
             
             self.log(f"Web service created with ID: {service_id}")
             return service_id
@@ -308,17 +486,9 @@ class RenderDeployer:
         """Create Celery worker service"""
         self.log("Creating Celery worker service...")
         
-        # Get database connection string
-        db_info = self.services.get("database", {}).get("connection_info", {})
-        redis_connection = self.services.get("redis", {}).get("connection_string")
-        
-        if not db_info or not redis_connection:
-            raise Exception("Database services not ready")
-        
-        # Use the connection string directly from PostgreSQL service
-        database_url = db_info.get("connectionString")
-        if not database_url:
-            raise Exception("PostgreSQL connection string not available")
+        # Web and worker are created concurrently; build the shared vars once
+        with self._services_lock:
+            self._base_env_vars = self._base_env_vars or self._build_base_env_vars()
         
         if not self.owner_id:
             raise Exception("Owner ID not set. Call get_owner_id() first.")
@@ -331,21 +501,18 @@ class RenderDeployer:
             "plan": "free",
             "region": "oregon",
             "buildCommand": "./build.sh",
-            "startCommand": "celery -A app.workers.celery_app worker --loglevel=info --concurrency=2",
+            "startCommand": "celery -A app.workers.celery_app worker --loglevel=info -Ofair -Q jobs,convert,archive",
             "envVars": [
-                {"key": "DATABASE_URL", "value": database_url},
-                {"key": "REDIS_URL", "value": redis_connection},
-                {"key": "CELERY_BROKER_URL", "value": redis_connection},
-                {"key": "CELERY_RESULT_BACKEND", "value": redis_connection},
-                {"key": "STORAGE_PATH", "value": "/tmp/storage"},
-                {"key": "PYTHONPATH", "value": "/opt/render/project/src"}
+                {"key": "CELERY_CONCURRENCY", "value": "2"},
+                *self._base_env_vars
             ]
         }
         
         try:
             result = self.make_request("POST", "services", worker_config)
             service_id = result["service"]["id"]
-            self.services["worker"] = {"id": service_id}
+            with self._services_lock:
+                self.services["worker"] = {"id": service_id}
             
             self.log(f"Worker service created with ID: {service_id}")
             return service_id
@@ -371,27 +538,32 @@ class RenderDeployer:
             
             # Step 0: Get owner ID
             self.log("Step 0: Getting account information...")
-            self.get_owner_id()
-            
-            # Step 1: Create PostgreSQL database
-            self.log("Step 1: Creating PostgreSQL database...")
-            db_id = self.create_postgresql_database()
+            self._cached_owner_id()
             
-            # Step 2: Create Redis database
-            self.log("Step 2: Creating Redis database...")
-            redis_id = self.create_redis_database()
-            
-            # Step 3: Create web service
-            self.log("Step 3: Creating FastAPI web service...")
-            web_id = self.create_web_service()
+            # Steps 1-2: Create PostgreSQL and Redis databases; they don't depend
+            # on each other, so create both and then wait for them together
+            self.log("Steps 1-2: Creating PostgreSQL and Redis databases...")
+            db_id = self.create_postgresql_database(wait=False)
+            redis_id = self.create_redis_database(wait=False)
+            db_ready, redis_ready = self.wait_for_databases(db_id, redis_id)
+            if not db_ready:
+                raise Exception("Failed to create PostgreSQL database")
+            if not redis_ready:
+                raise Exception("Failed to create Redis database")
             
-            # Step 4: Create worker service
-            self.log("Step 4: Creating Celery worker service...")
-            worker_id = self.create_worker_service()
+            # Steps 3-4: Create web and worker services; both only need the
+            # databases, so send the two requests at the same time
+            self.log("Steps 3-4: Creating FastAPI web and Celery worker services...")
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="create-service") as executor:
+                futures = [
+                    executor.submit(self.create_web_service),
+                    executor.submit(self.create_worker_service)
+                ]
+                web_id, worker_id = [future.result() for future in futures]
             
             # Step 5: Wait for web service to be ready and get URL
             self.log("Step 5: Waiting for web service to be ready...")
-            web_service = self.wait_for_service(web_id, "Web Service")
+            web_service = self.wait("service", web_id, "Web Service")
             
             if web_service:
                 service_url = self.get_service_url(web_id)
@@ -423,6 +595,8 @@ class RenderDeployer:
         except Exception as e:
             self.log(f"Deployment failed: {e}", "ERROR")
             return False
+        finally:
+            self.session.close()
 
 
 def main():
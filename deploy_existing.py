@@ -4,12 +4,67 @@ Deployment script for bulk DOCX to PDF converter using existing Render databases
 """
 
 import requests
+import hashlib
 import json
+import os
+import tempfile
 import argparse
+import random
+import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.exceptions import ReadTimeoutError
+from urllib3.util.retry import Retry
 from datetime import datetime
+from pathlib import Path
 from typing import Dict, Any, Optional
 
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    # orjson is optional; fall back to the stdlib encoder
+    _json_dumps = lambda data: json.dumps(data).encode()
+    _json_loads = json.loads
+
+_STRFTIME = "%Y-%m-%d %H:%M:%S"
+
+# Final statuses of a Render deploy
+DEPLOY_READY = ['live']
+DEPLOY_FAILED = ['build_failed', 'update_failed', 'deactivated']
+
+# The event stream is read with a short timeout so the overall deadline is
+# re-checked while no events arrive
+STREAM_READ_TIMEOUT = 15
+
+# Owner IDs never change for an API key, so they're cached between runs
+OWNER_CACHE_DIR = Path.home() / ".cache" / "render_deployer"
+OWNER_CACHE_TTL = 24 * 60 * 60  # 24 hours
+
+# Probe idle pooled connections so they survive the quiet stretches between
+# polls instead of being dropped by NATs and load balancers
+_KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+]
+if hasattr(socket, "TCP_KEEPIDLE"):
+    _KEEPALIVE_SOCKET_OPTIONS += [
+        (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 20)
+    ]
+
+
+class _KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections send TCP keep-alives"""
+    
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["socket_options"] = _KEEPALIVE_SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
+
+
 class RenderDeployer:
     def __init__(self, api_key: str, repo_url: str, timeout: int = 600):
         self.api_key = api_key
@@ -20,7 +75,28 @@ class RenderDeployer:
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        # Reuse pooled keep-alive connections to the API across requests and
+        # polls, retrying transient errors; POSTs carry an idempotency key
+        # (see make_request), so they're retried too. Every call goes to one
+        # host, so a single pool sized for the two threads that talk to it at
+        # once keeps the socket count down.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = _KeepAliveAdapter(
+            pool_connections=1,
+            pool_maxsize=2,
+            max_retries=Retry(
+                total=5,
+                backoff_factor=0.5,
+                status_forcelist=[429, 500, 502, 503, 504],
+                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"}
+            )
+        )
+        self.session.mount("https://", adapter)
+        self._log_lock = threading.Lock()
         self.owner_id = None
+        # Public URL of the web service, known as soon as it's created
+        self.web_url = None
         
         # Existing database IDs
         self.postgres_id = "dpg-d2tcequuk2gs73co9mk0-a"
@@ -29,28 +105,47 @@ class RenderDeployer:
         # Connection strings (using Render internal hostnames)
         self.postgres_url = f"postgresql://converter_user@dpg-d2tcequuk2gs73co9mk0-a-oregon-postgres.render.com:5432/docx_converter"
         self.redis_url = f"redis://red-d2tcg1ur433s73d9fung-oregon-redis.render.com:6379"
+        
+        # Environment shared by the web and worker services, built on first use
+        self._base_env_vars = None
 
     def log(self, level: str, message: str):
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"[{timestamp}] {level}: {message}")
+        timestamp = datetime.now().strftime(_STRFTIME)
+        # The deploy waits run concurrently, so tag each line with the thread
+        # it came from and keep lines from different threads from interleaving
+        with self._log_lock:
+            print(f"[{timestamp}] [{threading.current_thread().name}] {level}: {message}")
 
     def make_request(self, method: str, endpoint: str, data: Optional[Dict] = None) -> requests.Response:
         url = f"{self.base_url}/{endpoint}"
+        body = None if data is None else _json_dumps(data)
+        headers = None
+        if body is not None and method.upper() == "POST":
+            # A retried creation sends the same key, so Render won't create it twice
+            headers = {"Idempotency-Key": hashlib.sha256(body).hexdigest()}
         try:
-            response = requests.request(method, url, headers=self.headers, json=data)
+            response = self.session.request(
+                method.upper(),
+                url,
+                data=body,
+                headers=headers,
+                timeout=30
+            )
             response.raise_for_status()
             return response
         except requests.exceptions.RequestException as e:
             self.log("ERROR", f"API request failed: {e}")
-            if hasattr(e.response, 'text'):
-                self.log("ERROR", f"Response: {e.response.text}")
+            if e.response is not None:
+                # Log at most the first 4KB of the error body, undecoded by charset detection
+                body = e.response.content[:4096].decode("utf-8", errors="replace")
+                self.log("ERROR", f"Response: {body}")
             raise
 
     def get_owner_id(self) -> str:
         """Get the owner ID for the account"""
         self.log("INFO", "Getting owner information...")
         response = self.make_request("GET", "owners")
-        owners = response.json()
+        owners = _json_loads(response.content)
         
         if not owners:
             raise Exception("No owners found")
@@ -59,6 +154,57 @@ class RenderDeployer:
         self.log("INFO", f"Found owner ID: {owner_id}")
         return owner_id
 
+    def _cached_owner_id(self) -> str:
+        """
+        Get the owner ID, reusing the one cached on disk for this API key for
+        up to a day instead of asking the API on every deploy
+        """
+        key = hashlib.sha256(self.api_key.encode()).hexdigest()[:16]
+        cache_path = OWNER_CACHE_DIR / f"{key}.json"
+        
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if time.time() - cached["ts"] < OWNER_CACHE_TTL:
+                self.owner_id = cached["owner_id"]
+                self.log("INFO", f"Using cached owner ID: {self.owner_id}")
+                return self.owner_id
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        
+        owner_id = self.get_owner_id()
+        
+        # Write to a temporary file and rename so a concurrent run never
+        # reads a partial cache entry
+        try:
+            OWNER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=OWNER_CACHE_DIR, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"ts": time.time(), "owner_id": owner_id}, f)
+                os.replace(tmp_path, cache_path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            self.log("WARNING", f"Could not cache owner ID: {e}")
+        
+        return owner_id
+    
+    def _build_base_env_vars(self) -> tuple:
+        """Build the environment variables shared by the web and worker services"""
+        return (
+            {"key": "DATABASE_URL", "value": self.postgres_url},
+            {"key": "REDIS_URL", "value": self.redis_url},
+            {"key": "CELERY_BROKER_URL", "value": self.redis_url},
+            {"key": "CELERY_RESULT_BACKEND", "value": self.redis_url},
+            {"key": "UPLOAD_DIR", "value": "/tmp/uploads"},
+            {"key": "CONVERTED_DIR", "value": "/tmp/converted"},
+            {"key": "MAX_FILE_SIZE_MB", "value": "50"},
+            {"key": "MAX_FILES_PER_BATCH", "value": "20"},
+            {"key": "ENVIRONMENT", "value": "production"}
+        )
+    
     def create_web_service(self) -> str:
         """Create the FastAPI web service"""
         timestamp = int(time.time())
@@ -66,6 +212,8 @@ class RenderDeployer:
         
         self.log("INFO", "Creating FastAPI web service...")
         
+        self._base_env_vars = self._base_env_vars or self._build_base_env_vars()
+        
         service_data = {
             "type": "web_service",
             "name": service_name,
@@ -82,26 +230,18 @@ class RenderDeployer:
                 "startCommand": "uvicorn app.main:app --host 0.0.0.0 --port 10000",
                 "numInstances": 1,
                 "envVars": [
-                    {"key": "DATABASE_URL", "value": self.postgres_url},
-                    {"key": "REDIS_URL", "value": self.redis_url},
-                    {"key": "CELERY_BROKER_URL", "value": self.redis_url},
-                    {"key": "CELERY_RESULT_BACKEND", "value": self.redis_url},
-                    {"key": "UPLOAD_DIR", "value": "/tmp/uploads"},
-                    {"key": "CONVERTED_DIR", "value": "/tmp/converted"},
-                    {"key": "MAX_FILE_SIZE_MB", "value": "50"},
-                    {"key": "MAX_FILES_PER_BATCH", "value": "20"},
-                    {"key": "CORS_ORIGINS", "value": "*"},
-                    {"key": "ENVIRONMENT", "value": "production"}
+                    *self._base_env_vars,
+                    {"key": "CORS_ORIGINS", "value": "*"}
                 ]
             }
         }
         
-        response = self.make_request("POST", "services", service_data)
-        service_id = response.json()['id']
-        service_url = response.json()['serviceDetails']['url']
+        service = _json_loads(self.make_request("POST", "services", service_data).content)
+        service_id = service['id']
+        self.web_url = service['serviceDetails']['url']
         
         self.log("INFO", f"Created web service: {service_name} (ID: {service_id})")
-        self.log("INFO", f"Web service URL: {service_url}")
+        self.log("INFO", f"Web service URL: {self.web_url}")
         
         return service_id
 
@@ -112,6 +252,8 @@ class RenderDeployer:
         
         self.log("INFO", "Creating Celery worker service...")
         
+        self._base_env_vars = self._base_env_vars or self._build_base_env_vars()
+        
         service_data = {
             "type": "private_service",
             "name": service_name,
@@ -125,61 +267,154 @@ class RenderDeployer:
                 "plan": "free",
                 "region": "oregon",
                 "buildCommand": "pip install -r requirements.txt",
-                "startCommand": "celery -A app.workers.celery_app worker --loglevel=info",
+                "startCommand": "celery -A app.workers.celery_app worker --loglevel=info -Ofair -Q jobs,convert,archive",
                 "numInstances": 1,
-                "envVars": [
-                    {"key": "DATABASE_URL", "value": self.postgres_url},
-                    {"key": "REDIS_URL", "value": self.redis_url},
-                    {"key": "CELERY_BROKER_URL", "value": self.redis_url},
-                    {"key": "CELERY_RESULT_BACKEND", "value": self.redis_url},
-                    {"key": "UPLOAD_DIR", "value": "/tmp/uploads"},
-                    {"key": "CONVERTED_DIR", "value": "/tmp/converted"},
-                    {"key": "MAX_FILE_SIZE_MB", "value": "50"},
-                    {"key": "MAX_FILES_PER_BATCH", "value": "20"},
-                    {"key": "ENVIRONMENT", "value": "production"}
-                ]
+                "envVars": list(self._base_env_vars)
             }
         }
         
         response = self.make_request("POST", "services", service_data)
-        service_id = response.json()['id']
+        service_id = _json_loads(response.content)['id']
         
         self.log("INFO", f"Created worker service: {service_name} (ID: {service_id})")
         
         return service_id
 
-    def wait_for_service_deployment(self, service_id: str, service_type: str) -> bool:
-        """Wait for service to be deployed"""
-        self.log("INFO", f"Waiting for {service_type} service to deploy...")
+    def _poll(self, endpoint: str, name: str, status_fn, ready: list, failed: list,
+              deadline: float) -> Optional[str]:
+        """
+        Poll an API endpoint until the status it reports is ready or failed
         
-        start_time = time.time()
-        while time.time() - start_time < self.timeout:
+        Checks back off exponentially from 2s up to 30s, with jitter so
+        concurrent waits don't poll in lockstep. Returns the final status,
+        or None once the deadline passes.
+        """
+        delay = 2
+        while time.time() < deadline:
             try:
-                response = self.make_request("GET", f"services/{service_id}")
-                service_data = response.json()
+                response = self.make_request("GET", endpoint)
+                status = status_fn(_json_loads(response.content))
                 
-                # Check if there are any deploys
-                deploys_response = self.make_request("GET", f"services/{service_id}/deploys")
-                deploys = deploys_response.json()
+                if status in ready or status in failed:
+                    return status
                 
-                if deploys:
-                    latest_deploy = deploys[0]
-                    status = latest_deploy['status']
+                if status:
+                    self.log("INFO", f"{name} status: {status}")
+                
+            except Exception as e:
+                self.log("ERROR", f"Error checking {name} status: {e}")
+            
+            # Don't sleep past the deadline
+            pause = delay + random.uniform(0, 0.5 * delay)
+            time.sleep(max(0, min(pause, deadline - time.time())))
+            delay = min(delay * 1.7, 30)
+        
+        return None
+    
+    @staticmethod
+    def _deploy_status(deploys: list) -> Optional[str]:
+        """Status of the latest deploy in a deploys listing"""
+        return deploys[0]['status'] if deploys else None
+    
+    def _latest_deploy_status(self, service_id: str, service_type: str) -> Optional[str]:
+        """Status of the service's latest deploy, or None if it can't be read"""
+        try:
+            response = self.make_request("GET", f"services/{service_id}/deploys?limit=1")
+            return self._deploy_status(_json_loads(response.content))
+        except Exception as e:
+            self.log("ERROR", f"Error checking {service_type} service status: {e}")
+            return None
+    
+    def _stream_deploy_status(self, service_id: str, service_type: str, deadline: float) -> Optional[str]:
+        """
+        Follow the service's event stream until a deploy ends
+        
+        Returns the final deploy status, or None if the deadline passes, the
+        API doesn't serve an event stream or it closes first; in the latter
+        cases the caller polls for the rest of the time.
+        """
+        url = f"{self.base_url}/services/{service_id}/events"
+        following = False
+        
+        while time.time() < deadline:
+            # The stream only carries new events, so catch a deploy that
+            # ended before (re)subscribing from the latest deploy instead
+            status = self._latest_deploy_status(service_id, service_type)
+            if status in DEPLOY_READY or status in DEPLOY_FAILED:
+                return status
+            
+            try:
+                with self.session.get(
+                    url,
+                    stream=True,
+                    headers={"Accept": "text/event-stream"},
+                    timeout=(5, STREAM_READ_TIMEOUT)
+                ) as response:
+                    content_type = response.headers.get("Content-Type", "")
+                    if response.status_code != 200 or not content_type.startswith("text/event-stream"):
+                        return None
                     
-                    if status == 'live':
-                        self.log("INFO", f"{service_type} service deployed successfully!")
-                        return True
-                    elif status in ['build_failed', 'update_failed', 'deactivated']:
-                        self.log("ERROR", f"{service_type} service deployment failed with status: {status}")
-                        return False
-                    else:
-                        self.log("INFO", f"{service_type} service status: {status}")
+                    if not following:
+                        self.log("INFO", f"Following {service_type} service events...")
+                        following = True
+                    
+                    for line in response.iter_lines(decode_unicode=True):
+                        if time.time() >= deadline:
+                            return None
+                        
+                        # Only "data:" lines carry events; skip comments and keep-alives
+                        if not line or not line.startswith("data:"):
+                            continue
+                        
+                        try:
+                            event = _json_loads(line[len("data:"):].strip())
+                        except ValueError:
+                            continue
+                        
+                        if event.get("type") == "deploy_ended":
+                            return event.get("deploy", {}).get("status")
                 
-                time.sleep(30)
+                return None
                 
-            except Exception as e:
-                self.log("ERROR", f"Error checking service status: {e}")
-                time.sleep(30)
+            except requests.exceptions.RequestException as e:
+                # requests reports a read timeout mid-stream as a ConnectionError
+                quiet = isinstance(e, requests.exceptions.ReadTimeout) or (
+                    e.args and isinstance(e.args[0], ReadTimeoutError)
+                )
+                if not (following and quiet):
+                    self.log("WARNING", f"{service_type} service event stream unavailable: {e}")
+                    return None
+                # No events for a while; re-check the deadline and resubscribe
+        
+        return None
+    
+    def wait_for_service_deployment(self, service_id: str, service_type: str) -> bool:
+        """Wait for service to be deployed"""
+        self.log("INFO", f"Waiting for {service_type} service to deploy...")
+        
+        # Streaming and polling share one deadline, so falling back to
+        # polling never extends the wait past the configured timeout
+        deadline = time.time() + self.timeout
+        
+        # React to the deploy finishing as it happens where the API streams
+        # events; otherwise the latest deploy's status tells whether it's live
+        status = self._stream_deploy_status(service_id, service_type, deadline)
+        if status is None and time.time() < deadline:
+            status = self._poll(
+                f"services/{service_id}/deploys?limit=1",
+                f"{service_type} service",
+                self._deploy_status,
+                ready=DEPLOY_READY,
+                failed=DEPLOY_FAILED,
+                deadline=deadline
+            )
+        
+        if status == 'live':
+            self.log("INFO", f"{service_type} service deployed successfully!")
+            return True
+        elif status is not None:
+            self.log("ERROR", f"{service_type} service deployment failed with status: {status}")
+            return False
         
         self.log("ERROR", f"{service_type} service deployment timed out")
         return False
@@ -199,7 +434,7 @@ class RenderDeployer:
             
             # Step 0: Get owner ID
             self.log("INFO", "Step 0: Getting account information...")
-            self.owner_id = self.get_owner_id()
+            self.owner_id = self._cached_owner_id()
             
             # Step 1: Create web service
             self.log("INFO", "Step 1: Creating FastAPI web service...")
@@ -212,13 +447,15 @@ class RenderDeployer:
             # Step 3: Wait for deployments
             self.log("INFO", "Step 3: Waiting for services to deploy...")
             
-            web_deployed = self.wait_for_service_deployment(web_service_id, "Web")
-            worker_deployed = self.wait_for_service_deployment(worker_service_id, "Worker")
+            # Render builds both services at the same time, so wait for them together
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="wait-deploy") as executor:
+                web_future = executor.submit(self.wait_for_service_deployment, web_service_id, "Web")
+                worker_future = executor.submit(self.wait_for_service_deployment, worker_service_id, "Worker")
+                web_deployed = web_future.result()
+                worker_deployed = worker_future.result()
             
             if web_deployed and worker_deployed:
-                # Get final service details
-                web_response = self.make_request("GET", f"services/{web_service_id}")
-                web_url = web_response.json()['serviceDetails']['url']
+                web_url = self.web_url
                 
                 print("\n" + "="*80)
                 print("🎉 DEPLOYMENT SUCCESSFUL!")
@@ -241,6 +478,8 @@ class RenderDeployer:
         except Exception as e:
             self.log("ERROR", f"Deployment failed: {e}")
             return False
+        finally:
+            self.session.close()
 
 def main():
     parser = argparse.ArgumentParser(description="Deploy bulk DOCX to PDF converter to Render.com using existing databases")
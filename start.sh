@@ -67,7 +67,7 @@ echo "🔧 Management Commands:"
 echo "   • View logs:        docker compose logs -f"
 echo "   • Stop service:     docker compose down"
 echo "   • Restart service:  docker compose restart"
-echo "   • Scale workers:    docker compose up --scale worker=4"
+echo "   • Scale workers:    docker compose up --scale worker-convert=4"
 echo ""
 echo "🧪 Testing:"
 echo "   • Run test script:  python3 test_service.py"
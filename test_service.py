@@ -7,68 +7,56 @@ and polls for completion.
 """
 
 import requests
-import zipfile
-import io
 import time
-import json
+from concurrent.futures import ThreadPoolExecutor
 
-
-def create_sample_docx():
-    """Create a simple DOCX file for testing"""
-    doc = Document()
-    doc.add_heading('Test Document', 0)
-    doc.add_paragraph('This is a test document for the bulk DOCX to PDF converter.')
-    doc.add_paragraph('It contains some sample text to verify the conversion works properly.')
-    
-    # Save to bytes
-    docx_buffer = io.BytesIO()
-    doc.save(docx_buffer)
-    docx_buffer.seek(0)
-    return docx_buffer.getvalue()
-
-
-def create_test_zip():
-    """Create a ZIP file containing sample DOCX files"""
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # Create multiple test files
-        for i in range(3):
-            docx_content = create_sample_docx()
-            zip_file.writestr(f'test_document_{i+1}.docx', docx_content)
-    
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
+# The fixtures and HTTP helpers are shared with the production smoke test
+from test_production import (
+    _json_loads,
+    create_session,
+    create_test_zip,
+    multipart_file_body
+)
 
 
 def test_service(base_url='http://localhost:8000'):
     """Test the bulk conversion service"""
     
+    session = create_session()
+    
     print("🧪 Testing Bulk DOCX to PDF Converter Service")
     print("=" * 50)
     
+    # Build the test ZIP in the background while waiting on the service's
+    # first response, which takes a while when it's cold-starting
+    executor = ThreadPoolExecutor(max_workers=1)
+    zip_future = executor.submit(create_test_zip, 3)
+    executor.shutdown(wait=False)
+    
     # Check if service is running
     try:
-        response = requests.get(f'{base_url}/')
-        print(f" Service is running: {response.json()}")
+        response = session.get(f'{base_url}/')
+        print(f" Service is running: {_json_loads(response.content)}")
     except requests.exceptions.ConnectionError:
         print(" Service is not running. Please start it with: docker-compose up")
         return
     
     # Create test ZIP file
     print("\n📁 Creating test ZIP file with 3 DOCX documents...")
-    zip_content = create_test_zip()
+    zip_content = zip_future.result()
     
     # Submit job
     print("📤 Submitting conversion job...")
     try:
-        response = requests.post(
+        content_type, body = multipart_file_body('file', 'test_documents.zip', zip_content, 'application/zip')
+        response = session.post(
             f'{base_url}/api/v1/jobs',
-            files={'file': ('test_documents.zip', zip_content, 'application/zip')}
+            data=body,
+            headers={'Content-Type': content_type}
         )
         
         if response.status_code == 202:
-            job_data = response.json()
+            job_data = _json_loads(response.content)
             job_id = job_data['job_id']
             print(f" Job submitted successfully!")
             print(f"   Job ID: {job_id}")
@@ -84,40 +72,45 @@ def test_service(base_url='http://localhost:8000'):
     
     # Poll for completion
     print(f"\n⏳ Polling job status (Job ID: {job_id})...")
-    max_attempts = 60  # 5 minutes max
+    # Check back quickly at first, backing off to every 5s for long jobs
+    deadline = time.monotonic() + 300  # 5 minutes max
+    delay = 0.25
     attempt = 0
     
-    while attempt < max_attempts:
+    while time.monotonic() < deadline:
         try:
-            response = requests.get(f'{base_url}/api/v1/jobs/{job_id}')
+            response = session.get(f'{base_url}/api/v1/jobs/{job_id}')
             
             if response.status_code == 200:
-                status_data = response.json()
+                status_data = _json_loads(response.content)
                 status = status_data['status']
                 
                 print(f"   Status: {status}")
                 
                 if status == 'COMPLETED':
                     print(" Job completed successfully!")
-                    print("   File statuses:")
+                    # Print the report in one write rather than a line at a time
+                    lines = ["   File statuses:"]
                     for file_info in status_data['files']:
                         status_icon = "" if file_info['status'] == 'COMPLETED' else ""
-                        print(f"   {status_icon} {file_info['filename']}: {file_info['status']}")
+                        lines.append(f"   {status_icon} {file_info['filename']}: {file_info['status']}")
                         if file_info.get('error_message'):
-                            print(f"      Error: {file_info['error_message']}")
+                            lines.append(f"      Error: {file_info['error_message']}")
+                    print("\n".join(lines))
                     
                     # Download results
                     download_url = status_data.get('download_url')
                     if download_url:
                         print(f"\n📥 Downloading results from: {download_url}")
-                        download_response = requests.get(f"{base_url}{download_url}")
-                        
-                        if download_response.status_code == 200:
-                            with open('converted_files.zip', 'wb') as f:
-                                f.write(download_response.content)
-                            print(" Results downloaded successfully as 'converted_files.zip'")
-                        else:
-                            print(f" Download failed: {download_response.status_code}")
+                        # Stream the archive to disk rather than holding it all in memory
+                        with session.get(f"{base_url}{download_url}", stream=True) as download_response:
+                            if download_response.status_code == 200:
+                                with open('converted_files.zip', 'wb') as f:
+                                    for chunk in download_response.iter_content(chunk_size=1024 * 1024):
+                                        f.write(chunk)
+                                print(" Results downloaded successfully as 'converted_files.zip'")
+                            else:
+                                print(f" Download failed: {download_response.status_code}")
                     
                     break
                     
@@ -128,8 +121,9 @@ def test_service(base_url='http://localhost:8000'):
                     break
                     
                 else:  # PENDING or IN_PROGRESS
-                    print(f"   Waiting... (attempt {attempt + 1}/{max_attempts})")
-                    time.sleep(5)
+                    print(f"   Waiting... (attempt {attempt + 1})")
+                    time.sleep(delay)
+                    delay = min(delay * 2, 5.0)
                     
             else:
                 print(f" Error checking status: {response.status_code}")
@@ -141,8 +135,7 @@ def test_service(base_url='http://localhost:8000'):
             break
             
         attempt += 1
-    
-    if attempt >= max_attempts:
+    else:
         print("⏰ Polling timeout - job may still be processing")
     
     print(f"\n🏁 Test completed!")
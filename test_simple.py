@@ -6,99 +6,65 @@ This script creates a minimal test ZIP file and tests the service endpoints.
 """
 
 import requests
-import zipfile
-import io
 import time
+from concurrent.futures import ThreadPoolExecutor
 import base64
 
-
-def create_minimal_docx():
-    """Create a minimal valid DOCX file structure"""
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as docx_zip:
-        # Add [Content_Types].xml
-        content_types = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
-<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
-<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
-<Default Extension="xml" ContentType="application/xml"/>
-<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
-</Types>'''
-        docx_zip.writestr('[Content_Types].xml', content_types)
-        
-        # Add _rels/.rels
-        rels = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
-<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
-<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
-</Relationships>'''
-        docx_zip.writestr('_rels/.rels', rels)
-        
-        # Add word/document.xml
-        document = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
-<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">
-<w:body>
-<w:p><w:r><w:t>Test Document for PDF Conversion</w:t></w:r></w:p>
-<w:p><w:r><w:t>This is a sample document created for testing the bulk DOCX to PDF converter service.</w:t></w:r></w:p>
-<w:sectPr/>
-</w:body>
-</w:document>'''
-        docx_zip.writestr('word/document.xml', document)
-    
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
-
-
-def create_test_zip():
-    """Create a ZIP file containing test DOCX files"""
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # Create test files with minimal DOCX content
-        docx_content = create_minimal_docx()
-        
-        for i in range(2):  # Just 2 files for testing
-            zip_file.writestr(f'test_document_{i+1}.docx', docx_content)
-    
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
+# The fixtures and HTTP helpers are shared with the production smoke test
+from test_production import (
+    _json_loads,
+    create_session,
+    create_test_zip,
+    multipart_file_body
+)
 
 
 def test_service(base_url='http://localhost:8000'):
     """Test the bulk conversion service"""
     
+    session = create_session()
+    
     print("Testing Bulk DOCX to PDF Converter Service")
     print("=" * 50)
     
+    # Build the test ZIP in the background while waiting on the service's
+    # first response, which takes a while when it's cold-starting
+    executor = ThreadPoolExecutor(max_workers=1)
+    zip_future = executor.submit(create_test_zip)
+    executor.shutdown(wait=False)
+    
     # Check if service is running
     try:
-        response = requests.get(f'{base_url}/')
-        print(f"Service is running: {response.json()}")
+        response = session.get(f'{base_url}/')
+        print(f"Service is running: {_json_loads(response.content)}")
     except requests.exceptions.ConnectionError:
         print("Service is not running. Please start it with: docker compose up")
         return
     
     # Test health endpoint
     try:
-        response = requests.get(f'{base_url}/health')
-        print(f"Health check: {response.json()}")
+        response = session.get(f'{base_url}/health')
+        print(f"Health check: {_json_loads(response.content)}")
     except Exception as e:
         print(f"Health check failed: {e}")
     
     # Create test ZIP file
     print("\nCreating test ZIP file with 2 DOCX documents...")
-    zip_content = create_test_zip()
+    zip_content = zip_future.result()
     print(f"   ZIP file size: {len(zip_content)} bytes")
     
     # Submit job
     print("Submitting conversion job...")
     try:
-        response = requests.post(
+        content_type, body = multipart_file_body('file', 'test_documents.zip', zip_content, 'application/zip')
+        response = session.post(
             f'{base_url}/api/v1/jobs',
-            files={'file': ('test_documents.zip', zip_content, 'application/zip')}
+            data=body,
+            headers={'Content-Type': content_type}
         )
         
         if response.status_code == 202:
-            job_data = response.json()
+            job_data = _json_loads(response.content)
             job_id = job_data['job_id']
             print(f"Job submitted successfully!")
             print(f"   Job ID: {job_id}")
@@ -114,41 +80,47 @@ def test_service(base_url='http://localhost:8000'):
     
     # Poll for completion
     print(f"\nPolling job status (Job ID: {job_id})...")
-    max_attempts = 30  # 2.5 minutes max
+    # Check back quickly at first, backing off to every 5s for long jobs
+    deadline = time.monotonic() + 150  # 2.5 minutes max
+    delay = 0.25
     attempt = 0
     
-    while attempt < max_attempts:
+    while time.monotonic() < deadline:
         try:
-            response = requests.get(f'{base_url}/api/v1/jobs/{job_id}')
+            response = session.get(f'{base_url}/api/v1/jobs/{job_id}')
             
             if response.status_code == 200:
-                status_data = response.json()
+                status_data = _json_loads(response.content)
                 status = status_data['status']
                 
                 print(f"   Status: {status}")
                 
                 if status == 'COMPLETED':
                     print("Job completed successfully!")
-                    print("   File statuses:")
+                    # Print the report in one write rather than a line at a time
+                    lines = ["   File statuses:"]
                     for file_info in status_data['files']:
                         status_symbol = "[OK]" if file_info['status'] == 'COMPLETED' else "[FAIL]"
-                        print(f"   {status_symbol} {file_info['filename']}: {file_info['status']}")
+                        lines.append(f"   {status_symbol} {file_info['filename']}: {file_info['status']}")
                         if file_info.get('error_message'):
-                            print(f"      Error: {file_info['error_message']}")
+                            lines.append(f"      Error: {file_info['error_message']}")
+                    print("\n".join(lines))
                     
                     # Download results
                     download_url = status_data.get('download_url')
                     if download_url:
                         print(f"\nDownloading results from: {download_url}")
-                        download_response = requests.get(f"{base_url}{download_url}")
-                        
-                        if download_response.status_code == 200:
-                            with open('converted_files.zip', 'wb') as f:
-                                f.write(download_response.content)
-                            print("Results downloaded successfully as 'converted_files.zip'")
-                            print(f"   Downloaded file size: {len(download_response.content)} bytes")
-                        else:
-                            print(f"Download failed: {download_response.status_code}")
+                        # Stream the archive to disk rather than holding it all in memory
+                        with session.get(f"{base_url}{download_url}", stream=True) as download_response:
+                            if download_response.status_code == 200:
+                                with open('converted_files.zip', 'wb') as f:
+                                    for chunk in download_response.iter_content(chunk_size=1024 * 1024):
+                                        f.write(chunk)
+                                    download_size = f.tell()
+                                print("Results downloaded successfully as 'converted_files.zip'")
+                                print(f"   Downloaded file size: {download_size} bytes")
+                            else:
+                                print(f"Download failed: {download_response.status_code}")
                     
                     break
                     
@@ -159,8 +131,9 @@ def test_service(base_url='http://localhost:8000'):
                     break
                     
                 else:  # PENDING or IN_PROGRESS
-                    print(f"   Waiting... (attempt {attempt + 1}/{max_attempts})")
-                    time.sleep(5)
+                    print(f"   Waiting... (attempt {attempt + 1})")
+                    time.sleep(delay)
+                    delay = min(delay * 2, 5.0)
                     
             else:
                 print(f"Error checking status: {response.status_code}")
@@ -172,8 +145,7 @@ def test_service(base_url='http://localhost:8000'):
             break
             
         attempt += 1
-    
-    if attempt >= max_attempts:
+    else:
         print("Polling timeout - job may still be processing")
         print("   Check the status manually or increase timeout")
     